@@ -1,5 +1,7 @@
 from pandas import DataFrame, Series, isna, notna
-from pymongo import MongoClient
+from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 from assets import AssetsData
 import df_functions as dff
 from typing import List, Dict
@@ -7,7 +9,9 @@ from typing import List, Dict
 # from model import definition
 from operations import OpInstanceDefinition, OperationType, OperationsData
 from pattern import PatternData
-from utils import BasicDefinition, get_config_from_file
+from utils import BasicDefinition, get_config_from_file, node_to_record
+from persistence import Backend
+from report import current_stage, set_current_stage
 from states import SCDefinition,\
                    PreconditionRS,\
                    ResultRS,\
@@ -23,10 +27,11 @@ import yaml
 from model.equipment import Operation
 import numpy as np
 import model
-from tqdm import tqdm
 from typing import Tuple
 
 COLLECTION = 'carrier'
+# natural key of the action documents, the key is unique by action type
+DOCUMENT_KEYS = ('type', 'key')
 RAILS = {1:'y-1292', 2:'y-763', 3:'y-254', 4:'y+254', 5:'y+763', 6:'y+1292'}
 ARM_CONFIG = {
   'wrist':{
@@ -48,10 +53,6 @@ EFFECTORS_STATES = {
   'flange':'flange_c_drilling'
 }
 
-MONGO_SERVER_HOST = 'debianvm'
-MONGO_SERVER_PORT = 27017
-MONGO_DATABASE = 'mars'
-
 def get_arm_configuration(wrist:str, forearm:str, arm:str):
   wrist = ARM_CONFIG['wrist'][wrist]
   forearm = ARM_CONFIG['forearm'][forearm]
@@ -59,6 +60,23 @@ def get_arm_configuration(wrist:str, forearm:str, arm:str):
 
   return MMvt.Configuration(wrist, forearm, arm)
 
+def allocate_action_id(collection:str, key:str) -> str:
+  """function to allocate the id of an action when it is built
+  the id is the mongodb _id of the action document and the uid of its neo4j node,
+  the mongodb and neo4j writes don't wait for each other.
+  it is derived from the collection and the action key : a rebuild or a resumed
+  save gets the same ids
+
+  Args:
+      collection (str): name of the actions collection (ex: works, operations)
+      key (str): key of the action in the collection
+
+  Returns:
+      str: the ObjectId of the action, as an hexadecimal string
+  """
+  digest = hashlib.sha1(f'{collection}:{key}'.encode()).digest()
+  return str(ObjectId(digest[:12]))
+
 
 def get_movement_from_data(mvt_data:Series):
 
@@ -102,9 +120,13 @@ class ActionDefinition(SCDefinition):
                results: List[ResultRS],
                assets:List[BasicDefinition],
                pattern:List[BasicDefinition],
-               operations:List[OpInstanceDefinition]):
+               operations:List[OpInstanceDefinition],
+               key:str=None,
+               assembly:str=None):
     super().__init__(node, preconditions, results)
     self.__action = action
+    self.__key = key
+    self.__assembly = assembly
     self.__assets = assets
     self.__pattern = pattern
     self.__operations = operations
@@ -125,11 +147,73 @@ class ActionDefinition(SCDefinition):
   def operations(self):
     return self.__operations
 
+  @property
+  def key(self):
+    return self.__key
+
+  @property
+  def assembly(self):
+    return self.__assembly
+
   def to_dict(self):
     action_def = self.__action.to_dict()
     action_def.pop('_id')
     return action_def
 
+  def to_document(self) -> Dict:
+    # the action document with its key in the collection built
+    # and the uid of its assembly (work, probing and drilling actions),
+    # the id allocated at build time is the _id of the document
+    document = dict(key=self.__key, **self.__action.to_dict())
+    document['_id'] = ObjectId(document['_id'])
+    if self.__assembly:
+      document['assembly'] = self.__assembly
+    return document
+
+  def to_record(self) -> Dict:
+    return {
+      'node': node_to_record(self.node),
+      'action': self.__action.to_dict(),
+      'preconditions': [precond.to_record() for precond in self.preconditions],
+      'results': [result.to_record() for result in self.results],
+      'assets': [asset_def.node.uid for asset_def in self.__assets],
+      'pattern': [area_def.node.uid for area_def in self.__pattern],
+      'operations': [op_def.node.uid for op_def in self.__operations],
+      'assembly': self.__assembly
+    }
+
+  @classmethod
+  def from_record(cls, record:Dict,
+                  states_data:StatesData,
+                  operations:Dict[str, OpInstanceDefinition],
+                  assets_data:AssetsData,
+                  pattern_data:PatternData) -> 'ActionDefinition':
+    # preconditions and results are relative to the state objects
+    state_nodes = dict([(uid, state_def.node)\
+                        for uid, state_def in states_data.states.items()])
+
+    action = Action.parse(record['action'])
+    assert action, f"{record['key']} : action type {record['action']['type']} not valid"
+
+    def resolve(uids:List[str], collection:Dict, name:str) -> List:
+      # the definitions of the records uids, a missing one would not be saved
+      definitions = [collection.get(uid) for uid in uids]
+      missing = [uid for uid, definition in zip(uids, definitions) if definition is None]
+      assert not missing, f"{record['key']} : {', '.join(missing)} not found in {name} collection"
+      return definitions
+
+    return cls(node=ActionNode(**record['node']),
+               action=action,
+               preconditions=[PreconditionRS.from_record(precond, state_nodes)\
+                              for precond in record['preconditions']],
+               results=[ResultRS.from_record(result, state_nodes)\
+                        for result in record['results']],
+               assets=resolve(record['assets'], assets_data.assets, 'assets'),
+               pattern=resolve(record['pattern'], pattern_data.areas, 'pattern'),
+               operations=resolve(record['operations'], operations, 'operations'),
+               key=record['key'],
+               assembly=record.get('assembly'))
+
 def fill_mvt_configuration(configuration:Dict, config_args:Dict):
   
   config_txt = yaml.dump(configuration)
@@ -172,6 +256,15 @@ class ActionsData:
   ARM = ['T','D', None]
   WORK_MVT = ['station', 'approach', 'work', 'clearance']
   CONFIG_MVT = ['home', 'tool']
+  # collection of the actions of each movement, the config movements are station movements
+  MVT_COLLECTIONS = {
+    'station':'stations',
+    'work':'works',
+    'approach':'approaches',
+    'clearance':'clearances',
+    'home':'stations',
+    'tool':'stations'
+  }
 
   WEB_MOVEMENTS_COL = ['rail', 'mvt', 'localisation', # 'designation',
                        'reference', 'id', 'point', 'path',
@@ -230,6 +323,14 @@ class ActionsData:
   def operations(self):
     return self.__operations
 
+  def __len__(self):
+    return len(self.__manipulations)\
+           + len(self.__movements.stations)\
+           + len(self.__movements.approaches)\
+           + len(self.__movements.clearances)\
+           + len(self.__movements.works)\
+           + len(self.__operations)
+
   @classmethod
   def __build_relationships(cls, preconditions:Dict,
                             results:Dict,
@@ -277,13 +378,17 @@ class ActionsData:
     description = manipulation['description']
     definition = Manipulation(Operation[operation], equipment)
     
-    action = Action('', action_type, definition, description)
+    coll_key = '_'.join([operation, equipment.reference]).lower()
+    action_id = allocate_action_id('manipulations', coll_key)
+
+    action = Action(action_id, action_type, definition, description)
     preconditions = manipulation['preconditions']
     results = manipulation['results']
     
-    action_node = ActionNode(description=description,
-                              type=action_type,
-                              collection=COLLECTION)
+    action_node = ActionNode(uid=action_id,
+                             description=description,
+                             type=action_type,
+                             collection=COLLECTION)
 
     action_preconditions, actions_results = cls.__build_relationships(preconditions=preconditions,
                                                                      results=results,
@@ -305,9 +410,9 @@ class ActionsData:
                                          results=actions_results,
                                          assets=assets,
                                          pattern=pattern,
-                                         operations=operations)
+                                         operations=operations,
+                                         key=coll_key)
     
-    coll_key = '_'.join([operation, equipment.reference]).lower()
     return coll_key, action_definition
 
 
@@ -363,8 +468,24 @@ class ActionsData:
       movement_config = fill_mvt_configuration(movement_config,
                                                config_args)
 
+    #build key for collection
+    if mvt_type == 'work':
+      assy_ref = fmvt_data.reference
+      assy_id = fmvt_data.id
+      key = f'{assy_ref}.{assy_id}'.lower()
+    elif mvt_type in ['station', 'approach', 'clearance']:
+      key = "_".join([rail_area, rail_position] + sides).lower()
+    else:
+      key = mvt_type
+
+    # a work movement is the movement of an assembly
+    assembly = assemblies_uids.get(key) if mvt_type == 'work' else None
+
+    action_id = allocate_action_id(cls.MVT_COLLECTIONS[mvt_type], key)
+
     # build node 
-    action_node = ActionNode(description=movement_config['description'],
+    action_node = ActionNode(uid=action_id,
+                             description=movement_config['description'],
                              type=action_type,
                              collection=COLLECTION)
 
@@ -387,7 +508,7 @@ class ActionsData:
     path = Path(uf, ut, movements)
 
     # build action
-    mvt_action = Action('',action_type,
+    mvt_action = Action(action_id, action_type,
                         path,
                         movement_config['description'])
 
@@ -431,17 +552,9 @@ class ActionsData:
                                   results=mvt_results,
                                   assets=assets,
                                   pattern=pattern,
-                                  operations=operations)
-
-    #build key for collection
-    if mvt_type == 'work':
-      assy_ref = fmvt_data.reference
-      assy_id = fmvt_data.id
-      key = f'{assy_ref}.{assy_id}'.lower()
-    elif mvt_type in ['station', 'approach', 'clearance']:
-      key = "_".join([rail_area, rail_position] + sides).lower()
-    else:
-      key = mvt_type
+                                  operations=operations,
+                                  key=key,
+                                  assembly=assembly)
 
     return key, action_def
   
@@ -570,12 +683,14 @@ class ActionsData:
       movement = waction_def.movements[0]
 
       probing_definition = Probing(ut, uf, movement)
-      action = Action('',
+      action_id = allocate_action_id('operations', f'p{assy}')
+      action = Action(action_id,
                       action_type,
                       probing_definition,
                       f'probing of reference {stdef.node.uid}')
 
-      probing_node = ActionNode(description=f'probing of reference {stdef.node.uid}',
+      probing_node = ActionNode(uid=action_id,
+                                description=f'probing of reference {stdef.node.uid}',
                                 type=action_type,
                                 collection=COLLECTION)
       
@@ -593,7 +708,9 @@ class ActionsData:
                                            probing_results,
                                            assets=assets,
                                            pattern=[],
-                                           operations=[])
+                                           operations=[],
+                                           key=f'p{assy}',
+                                           assembly=work.assembly)
 
       probing_collection[f'p{assy}'] = action_definition
 
@@ -640,13 +757,15 @@ class ActionsData:
       operation_key = OperationsData.generate_uid(OperationType.DRILL, assy)
       operations = [operations_data.instances.get(operation_key)]
 
-      drilling_node = ActionNode(description=f'drilling of assembly {assy}',
-                                type=action_type,
-                                collection=COLLECTION)
+      action_id = allocate_action_id('operations', f'd{assy}')
+      drilling_node = ActionNode(uid=action_id,
+                                 description=f'drilling of assembly {assy}',
+                                 type=action_type,
+                                 collection=COLLECTION)
 
       drilling_definition = Drilling(10,10,True)
       
-      action = Action('',
+      action = Action(action_id,
                       action_type,
                       drilling_definition,
                       f'drilling of assembly {assy}')
@@ -657,24 +776,16 @@ class ActionsData:
                                       results=results,
                                       assets=assets,
                                       pattern=pattern,
-                                      operations=operations)
+                                      operations=operations,
+                                      key=f'd{assy}',
+                                      assembly=work_def.assembly)
       
       drilling_collection[f'd{assy}'] = drilling_def
 
     return drilling_collection
   
   @classmethod
-  def build_from_files(cls, 
-                       chconf_movements_file:str,
-                       web_movements_file:str,
-                       flange_movements_file:str,
-                       manipulations_yaml_file:str,
-                       movements_yaml_file:str,
-                       states_data:StatesData,
-                       operations_data:OperationsData,
-                       assemblies_uids:Dict[str,str],
-                       assets_data:AssetsData,
-                       pattern_data:PatternData) -> 'ActionsData':
+  def __read_movements_file(cls, movements_file:str) -> DataFrame:
     mvt_checks = {
       'path': cls.PATH,
       'position_type' : cls.POS_TYPE,
@@ -684,21 +795,17 @@ class ActionsData:
       'mvt': cls.WORK_MVT + cls.CONFIG_MVT
     }
 
-    # import the web data
-    web_mov_df = dff.build_and_check(web_movements_file,
-                                    'csv',
-                                    cls.WEB_MOVEMENTS_COL,
-                                    mvt_checks)
-
-    # import the flange data   
-    flange_mov_df = dff.build_and_check(flange_movements_file,
-                                    'csv',
-                                    cls.WEB_MOVEMENTS_COL,
-                                    mvt_checks)
+    return dff.build_and_check(movements_file,
+                               'csv',
+                               cls.WEB_MOVEMENTS_COL,
+                               mvt_checks)
 
+  @classmethod
+  def build_manipulations(cls,
+                          manipulations_yaml_file:str,
+                          states_data:StatesData,
+                          assets_data:AssetsData) -> Dict[str, ActionDefinition]:
     manipulations_config = get_config_from_file(manipulations_yaml_file)
-    movements_config = get_config_from_file(movements_yaml_file)
-    movements_config = movements_config['movements']
 
     manipulations_collection = {}
     for manipulation in manipulations_config['manipulations']:
@@ -706,44 +813,44 @@ class ActionsData:
                                                                    states_data,
                                                                    assets_data)
       manipulations_collection[key] = action_definition
-    
-    # init the movement collection
-    movements_collection = {
-      "work":{},
-      "station":{},
-      "approach":{},
-      "clearance":{}
-    }
 
-    web_mvt = cls.__build_movements_collection('web',
-                                               web_mov_df,
-                                               movements_config,
-                                               states_data,
-                                               assemblies_uids,
-                                               assets_data,
-                                               pattern_data)
-
-    for key in web_mvt:
-      movements_collection[key].update(web_mvt[key])
-
-    flange_mvt = cls.__build_movements_collection('flange',
-                                               flange_mov_df,
-                                               movements_config,
-                                               states_data,
-                                               assemblies_uids,
-                                               assets_data,
-                                               pattern_data)
-
-    for key in flange_mvt:
-      movements_collection[key].update(flange_mvt[key])
-    
-    # build changeconfig movement collection
-    # import the change conf data 
-    chconf_mov_df = dff.build_and_check(chconf_movements_file,
-                                        'csv',
-                                        cls.WEB_MOVEMENTS_COL,
-                                        mvt_checks)
+    return manipulations_collection
+
+  @classmethod
+  def build_movements(cls,
+                      rail_area:str,
+                      movements_file:str,
+                      movements_yaml_file:str,
+                      states_data:StatesData,
+                      assemblies_uids:Dict[str,str],
+                      assets_data:AssetsData,
+                      pattern_data:PatternData) -> Dict[str, Dict[str, ActionDefinition]]:
+    # import the rail area (web or flange) data
+    mov_df = cls.__read_movements_file(movements_file)
+
+    movements_config = get_config_from_file(movements_yaml_file)
+    movements_config = movements_config['movements']
+
+    return cls.__build_movements_collection(rail_area,
+                                            mov_df,
+                                            movements_config,
+                                            states_data,
+                                            assemblies_uids,
+                                            assets_data,
+                                            pattern_data)
+
+  @classmethod
+  def build_config_movements(cls,
+                             chconf_movements_file:str,
+                             movements_yaml_file:str,
+                             states_data:StatesData) -> Dict[str, ActionDefinition]:
+    # import the change conf data
+    chconf_mov_df = cls.__read_movements_file(chconf_movements_file)
+
+    movements_config = get_config_from_file(movements_yaml_file)
+    movements_config = movements_config['movements']
 
+    config_collection = {}
     for mvt in cls.CONFIG_MVT:
       mvt_data_df = chconf_mov_df[chconf_mov_df.mvt == mvt]
       movement_config = movements_config[mvt]
@@ -754,7 +861,34 @@ class ActionsData:
                                                mvt_data_df,
                                                states_data)
 
-      movements_collection['station'][key] = definition
+      config_collection[key] = definition
+
+    return config_collection
+
+  @classmethod
+  def build(cls,
+            manipulations_collection:Dict[str, ActionDefinition],
+            areas_movements:List[Dict[str, Dict[str, ActionDefinition]]],
+            config_collection:Dict[str, ActionDefinition],
+            states_data:StatesData,
+            operations_data:OperationsData,
+            assets_data:AssetsData) -> 'ActionsData':
+
+    # init the movement collection
+    movements_collection = {
+      "work":{},
+      "station":{},
+      "approach":{},
+      "clearance":{}
+    }
+
+    # merge the movements built for each rail area (web, flange)
+    for area_mvt in areas_movements:
+      for key in area_mvt:
+        movements_collection[key].update(area_mvt[key])
+
+    # changeconfig movements are station movements
+    movements_collection['station'].update(config_collection)
 
     movements = Movements(movements_collection['station'],
                           movements_collection['approach'],
@@ -774,87 +908,169 @@ class ActionsData:
 
     return cls(manipulations_collection, movements, operations_collection)
 
-  @staticmethod
-  def __save_in_mongo(action_collection:Dict[str, ActionDefinition]):
-    
-    mclient = MongoClient(MONGO_SERVER_HOST, MONGO_SERVER_PORT)
-    carrier = mclient.get_database(MONGO_DATABASE).get_collection(COLLECTION)
+  @classmethod
+  def build_from_files(cls, 
+                       chconf_movements_file:str,
+                       web_movements_file:str,
+                       flange_movements_file:str,
+                       manipulations_yaml_file:str,
+                       movements_yaml_file:str,
+                       states_data:StatesData,
+                       operations_data:OperationsData,
+                       assemblies_uids:Dict[str,str],
+                       assets_data:AssetsData,
+                       pattern_data:PatternData) -> 'ActionsData':
+
+    manipulations_collection = cls.build_manipulations(manipulations_yaml_file,
+                                                       states_data,
+                                                       assets_data)
+
+    web_mvt = cls.build_movements('web',
+                                  web_movements_file,
+                                  movements_yaml_file,
+                                  states_data,
+                                  assemblies_uids,
+                                  assets_data,
+                                  pattern_data)
+
+    flange_mvt = cls.build_movements('flange',
+                                     flange_movements_file,
+                                     movements_yaml_file,
+                                     states_data,
+                                     assemblies_uids,
+                                     assets_data,
+                                     pattern_data)
+
+    config_collection = cls.build_config_movements(chconf_movements_file,
+                                                   movements_yaml_file,
+                                                   states_data)
+
+    return cls.build(manipulations_collection,
+                     [web_mvt, flange_mvt],
+                     config_collection,
+                     states_data,
+                     operations_data,
+                     assets_data)
+
+  def to_records(self) -> Dict:
+    collections = {
+      'manipulations': self.__manipulations,
+      'stations': self.__movements.stations,
+      'approaches': self.__movements.approaches,
+      'clearances': self.__movements.clearances,
+      'works': self.__movements.works,
+      'operations': self.__operations
+    }
 
-    action_definitions = [action_def.action.to_dict(drop_id=True) for action_def in action_collection.values()]
+    return dict([(name, [dict(key=key, **action_def.to_record())\
+                         for key, action_def in collection.items()])\
+                 for name, collection in collections.items()])
 
-    res = carrier.insert_many(action_definitions)
+  @classmethod
+  def from_records(cls, records:Dict,
+                   states_data:StatesData,
+                   operations_data:OperationsData,
+                   assets_data:AssetsData,
+                   pattern_data:PatternData) -> 'ActionsData':
+    operations = dict([(op_def.node.uid, op_def)\
+                       for op_def in operations_data.instances.values()])
+
+    def build_collection(name:str) -> Dict[str, ActionDefinition]:
+      return dict([(record['key'], ActionDefinition.from_record(record,
+                                                                states_data,
+                                                                operations,
+                                                                assets_data,
+                                                                pattern_data))\
+                   for record in records[name]])
 
-    if not res.acknowledged :
-        raise Exception("Error during insertion") 
-    else :
-      mongo_ids = res.inserted_ids
-      
-      index=0
-      for action_def in action_collection.values():
-        action_def.node.uid = str(mongo_ids[index])
-        index+=1
-  
-  @staticmethod
-  def __save_nodes_and_connect(actions_collection:Dict[str, ActionDefinition]):
-    
-    for key, action_def in tqdm(actions_collection.items()):
-      node:ActionNode = action_def.node
-      preconditions = action_def.preconditions
-      results = action_def.results
-      assets = action_def.assets
-      pattern = action_def.pattern
-      operations = action_def.operations
-
-      node.save()
-
-      for precond in preconditions:
-        node.preconditions.connect(precond.property_node,
-                                   precond.definition)
-
-      for result in results:
-        node.results.connect(result.property_node,
-                             result.definition)
-      
-      for asset_def in assets:
-        node.assets.connect(asset_def.node)
-
-      for area_def in pattern:
-        node.areas.connect(area_def.node)
-
-      for operation_def in operations:
-        node.operations.connect(operation_def.node)
-
-  def save_data(self):
-    print('save actions in mongodb')
-    print('save manipulations in mongodb')
-    self.__save_in_mongo(self.__manipulations)
-    print('save work movements in mongodb')
-    self.__save_in_mongo(self.__movements.works)
-    print('save approach movements in mongodb')
-    self.__save_in_mongo(self.__movements.approaches)
-    print('save clearance movements in mongodb')
-    self.__save_in_mongo(self.__movements.clearances)
-    print('save station movements in mongodb')
-    self.__save_in_mongo(self.__movements.stations)
-    print('save operations in mongodb')
-    self.__save_in_mongo(self.__operations)
-    print('mongodb saving done')
-
-    print('save actions in neo4j')
-    print('save manipulations in neo4j')
-    self.__save_nodes_and_connect(self.__manipulations)
-    print('save work movements in neo4j')
-    self.__save_nodes_and_connect(self.__movements.works)
-    print('save approach movements in neo4j')
-    self.__save_nodes_and_connect(self.__movements.approaches)
-    print('save clearance movements in neo4j')
-    self.__save_nodes_and_connect(self.__movements.clearances)
-    print('save station movements in neo4j')
-    self.__save_nodes_and_connect(self.__movements.stations)
-    print('save operations in neo4j')
-    self.__save_nodes_and_connect(self.__operations)
-    print('neo4j saving done')
+    movements = Movements(build_collection('stations'),
+                          build_collection('approaches'),
+                          build_collection('clearances'),
+                          build_collection('works'))
+
+    return cls(build_collection('manipulations'),
+               movements,
+               build_collection('operations'))
 
+  @staticmethod
+  def __save_in_mongo(backend:Backend, name:str, action_collection:Dict[str, ActionDefinition]):
 
+    def save_documents(batch:List[ActionDefinition]):
+      # the documents are built while they are written, with the ids allocated at build time
+      action_definitions = (action_def.to_document() for action_def in batch)
 
+      # upserted on their natural key, a save run again replaces its documents
+      backend.save_documents(COLLECTION, action_definitions, DOCUMENT_KEYS)
 
+    backend.write_batches(f'{name}.documents', action_collection.values(), save_documents, graph=False)
+  
+  @staticmethod
+  def __save_nodes_and_connect(backend:Backend, name:str, actions_collection:Dict[str, ActionDefinition]):
+    
+    def save_nodes(batch:List[ActionDefinition]):
+      backend.save_nodes([action_def.node for action_def in batch])
+
+      relationships = []
+
+      for action_def in batch:
+        node:ActionNode = action_def.node
+        preconditions = action_def.preconditions
+        results = action_def.results
+        assets = action_def.assets
+        pattern = action_def.pattern
+        operations = action_def.operations
+
+        for precond in preconditions:
+          relationships.append((node, 'preconditions',
+                                precond.property_node,
+                                precond.definition))
+
+        for result in results:
+          relationships.append((node, 'results',
+                                result.property_node,
+                                result.definition))
+        
+        for asset_def in assets:
+          relationships.append((node, 'assets', asset_def.node))
+
+        for area_def in pattern:
+          relationships.append((node, 'areas', area_def.node))
+
+        for operation_def in operations:
+          relationships.append((node, 'operations', operation_def.node))
+
+      backend.connect_nodes(relationships)
+
+    backend.write_batches(f'{name}.nodes', actions_collection.values(), save_nodes, PatternData.rail_of)
+
+  def save_data(self, backend:Backend):
+    collections = [('manipulations', 'manipulations', self.__manipulations),
+                   ('works', 'work movements', self.__movements.works),
+                   ('approaches', 'approach movements', self.__movements.approaches),
+                   ('clearances', 'clearance movements', self.__movements.clearances),
+                   ('stations', 'station movements', self.__movements.stations),
+                   ('operations', 'operations', self.__operations)]
+
+    # the writers run in their own thread, they report under the save stage
+    stage = current_stage()
+
+    def save_in_mongo():
+      set_current_stage(stage)
+      print('save actions in mongodb')
+      for name, description, collection in collections:
+        print(f'save {description} in mongodb')
+        self.__save_in_mongo(backend, name, collection)
+      print('mongodb saving done')
+
+    def save_in_neo4j():
+      set_current_stage(stage)
+      print('save actions in neo4j')
+      for name, description, collection in collections:
+        print(f'save {description} in neo4j')
+        self.__save_nodes_and_connect(backend, name, collection)
+      print('neo4j saving done')
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+      writers = [executor.submit(save_in_mongo), executor.submit(save_in_neo4j)]
+      for writer in writers:
+        writer.result()
@@ -0,0 +1,47 @@
+import os
+import pickle
+from typing import Any, Dict
+
+class ArtifactStore:
+  """Class used to store the built collections between the build and the save phases
+
+  the collections are stored as plain records (dict, list, str, numbers)
+  produced by the to_records method of the *Data objects, not as neomodel objects,
+  and rebuilt with their from_records class method.
+  """
+
+  def __init__(self, artifacts_file:str):
+    self.__artifacts_file = artifacts_file
+
+  @property
+  def path(self):
+    return self.__artifacts_file
+
+  def exists(self) -> bool:
+    return os.path.exists(self.__artifacts_file)
+
+  def write(self, artifacts:Dict[str, Any]):
+    """function to store a collection of built data objects
+
+    Args:
+        artifacts (Dict[str, Any]): the *Data objects by stage name
+    """
+    records = dict([(name, data.to_records()) for name, data in artifacts.items()])
+
+    directory = os.path.dirname(self.__artifacts_file)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    # write in a temporary file then replace to never leave a partial store
+    tmp_file = self.__artifacts_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+      pickle.dump(records, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, self.__artifacts_file)
+
+  def read(self) -> Dict[str, Dict]:
+    """function to read the stored records
+
+    Returns:
+        Dict[str, Dict]: the records by stage name
+    """
+    with open(self.__artifacts_file, 'rb') as f:
+      return pickle.load(f)
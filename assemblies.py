@@ -12,8 +12,8 @@ from neo4mars.product.assembly import Assembly
 from neomodel.contrib.spatial_properties import NeomodelPoint
 
 from pattern import PatternData
-from tqdm import tqdm
-from utils import BasicDefinition, InstanceDefinition
+from utils import BasicDefinition, InstanceDefinition, node_to_record
+from persistence import Backend, build_nodes
 
 def get_rail_position(yValue: float) -> str :
     rail:str
@@ -78,7 +78,7 @@ def replace_reference(row:Series, parts_data:PartsData):
     rail_position = row.rail_position
 
     for el in el_stack:
-        yref = rail_position if not el == 'crossbeam' else "c35"
+        yref = rail_position if not el == PartsData.CROSSBEAM else PartsData.CROSSBEAM_AREA
         reference = parts_data.get_element(el, yref)
         ref_uid = PartsData.generate_uid(reference, yref)
         ref_tab.append(ref_uid)
@@ -113,19 +113,28 @@ class FastenersData:
   def instances(self)->InstanceDefinition:
     return self.__instances
 
-  def save_nodes(self):
+  def save_nodes(self, backend:Backend):
     print('save fastener nodes')
     print('save class nodes')
-    for bdef in tqdm(self.__classes.values()):
-      bdef.node.save()
+    def save_classes(batch:List[BasicDefinition]):
+      backend.save_nodes([bdef.node for bdef in batch])
+
+    backend.write_batches('fasteners.classes', self.__classes.values(), save_classes)
 
     print('save and connect instance nodes')
-    for instance_def in tqdm(self.__instances.values()):
-      node = instance_def.node
-      mother_node = instance_def.mother_node
+    def save_instances(batch:List[InstanceDefinition]):
+      backend.save_nodes([instance_def.node for instance_def in batch])
+
+      relationships = []
+      for instance_def in batch:
+        node = instance_def.node
+        mother_node = instance_def.mother_node
+
+        relationships.append((node, 'mother_class', mother_node))
 
-      node.save()
-      node.mother_class.connect(mother_node)
+      backend.connect_nodes(relationships)
+
+    backend.write_batches('fasteners.instances', self.__instances.values(), save_instances)
 
 
 class AssembleRS:
@@ -202,6 +211,11 @@ class AssembliesData:
   def assemblies(self)->Dict[str, AssemblyDefinition]:
     return self.__assemblies
 
+  def __len__(self):
+    return len(self.__assemblies)\
+           + len(self.__fasteners.classes)\
+           + len(self.__fasteners.instances)
+
   @classmethod
   def __build_master_dataframe(cls, source_file:str, parts_data:PartsData)->DataFrame:
     # get dataframe from source file
@@ -411,25 +425,116 @@ class AssembliesData:
       assy_collection[definition.aname.lower()] = coll_obj
 
     return cls(assy_collection, fasteners)
+
+  def to_records(self) -> Dict:
+    fclass_records = [node_to_record(bdef.node)\
+                      for bdef in self.__fasteners.classes.values()]
+
+    finstance_records = []
+    for key, finstance_def in self.__fasteners.instances.items():
+      finstance_records.append({'key': key,
+                                'node': node_to_record(finstance_def.node),
+                                'mother': finstance_def.mother_node.uid})
+
+    assy_records = []
+    for key, assy_def in self.__assemblies.items():
+      node = node_to_record(assy_def.node)
+      # store the origin point as a coordinates list
+      origin = assy_def.node.origin
+      node['origin'] = [origin.x, origin.y, origin.z]
+
+      assy_records.append({'key': key,
+                           'node': node,
+                           'fastener': assy_def.fastener.uid,
+                           'assemble': [dict(stackPart=stackel.part.uid, **stackel.definition)\
+                                        for stackel in assy_def.assemble],
+                           'pattern': [area_def.node.uid for area_def in assy_def.pattern]})
+
+    return {
+      'fastener_classes': fclass_records,
+      'fastener_instances': finstance_records,
+      'assemblies': assy_records
+    }
+
+  @classmethod
+  def from_records(cls, records:Dict,
+                   parts_data:PartsData,
+                   pattern_data:PatternData) -> 'AssembliesData':
+    fclass_collection = {}
+    for record in records['fastener_classes']:
+      fclass_collection[record['uid']] = BasicDefinition(FClass(**record))
+
+    finstance_collection = {}
+    finstance_nodes = {}
+    for record in records['fastener_instances']:
+      class_def = fclass_collection.get(record['mother'])
+      assert class_def, f"{record['mother']} not found in fastener class_collection"
+
+      node = FInstance(**record['node'])
+      finstance_collection[record['key']] = InstanceDefinition(node, class_def.node)
+      finstance_nodes[node.uid] = node
+
+    fasteners = FastenersData(fclass_collection, finstance_collection)
+
+    assy_collection = {}
+    for record in records['assemblies']:
+      node_record = record['node'].copy()
+      x, y, z = node_record.pop('origin')
+      node = Assembly(origin=NeomodelPoint(x=x, y=y, z=z), **node_record)
+
+      fastener = finstance_nodes.get(record['fastener'])
+      assert fastener, f"{record['fastener']} not found in fastener instance_collection"
+
+      assemble = []
+      for stack_def in record['assemble']:
+        part_def = parts_data.instances.get(stack_def['stackPart'])
+        assert part_def, f"{stack_def['stackPart']} not found in parts instances collection"
+        assemble.append(AssembleRS(part_def.node,
+                                   stack_def['stackThickness'],
+                                   stack_def['stackMaterial'],
+                                   stack_def['stackIndex']))
+
+      pattern = [pattern_data.areas.get(area) for area in record['pattern']]
+
+      assy_collection[record['key']] = AssemblyDefinition(node,
+                                                          fastener,
+                                                          assemble,
+                                                          pattern)
+
+    return cls(assy_collection, fasteners)
+
+  @staticmethod
+  def uids_from_database(build:str=None) -> Dict[str, str]:
+    # the collection key is the assembly name, the node description is 'assembly <name>'
+    prefix = 'assembly '
+    return dict([(assy.description[len(prefix):].lower(), assy.uid)\
+                 for assy in build_nodes(Assembly, build)])
     
-  def save_data(self)->None:
-    self.__fasteners.save_nodes()
+  def save_data(self, backend:Backend)->None:
+    self.__fasteners.save_nodes(backend)
     print('save and connect assembly nodes')
     
-    for assy_def in tqdm(self.__assemblies.values()):
-      node = assy_def.node
-      fastener = assy_def.fastener
-      assemble = assy_def.assemble
-      pattern = assy_def.pattern
-
-      node.save()
-      node.fastener.connect(fastener)
-      
-      for stackel in assemble:
-        node.assemble.connect(stackel.part, stackel.definition)
-      
-      for area_def in pattern:
-        node.pattern.connect(area_def.node)
+    def save_assemblies(batch:List[AssemblyDefinition]):
+      backend.save_nodes([assy_def.node for assy_def in batch])
+
+      relationships = []
+      for assy_def in batch:
+        node = assy_def.node
+        fastener = assy_def.fastener
+        assemble = assy_def.assemble
+        pattern = assy_def.pattern
+
+        relationships.append((node, 'fastener', fastener))
+        
+        for stackel in assemble:
+          relationships.append((node, 'assemble', stackel.part, stackel.definition))
+        
+        for area_def in pattern:
+          relationships.append((node, 'pattern', area_def.node))
+
+      backend.connect_nodes(relationships)
+
+    backend.write_batches('assemblies', self.__assemblies.values(), save_assemblies, PatternData.rail_of)
 
 
 
@@ -1,7 +1,8 @@
 
 from enum import Enum
-from utils import BasicDefinition
-from typing import Dict
+from utils import BasicDefinition, node_to_record
+from persistence import Backend, build_nodes
+from typing import Dict, List
 from utils import get_config_from_file, GetItemEnum
 from neo4mars.resource.asset import Carrier, EndEffector
 
@@ -17,6 +18,9 @@ class AssetsData:
   def assets(self):
     return self.__assets
 
+  def __len__(self):
+    return len(self.__assets)
+
   @classmethod
   def build_from_file(cls, assets_yaml_file:str):
     assets_def = get_config_from_file(assets_yaml_file)
@@ -39,6 +43,35 @@ class AssetsData:
     
     return cls(assets_collection)
 
-  def save_data(self):
+  def to_records(self) -> Dict:
+    records = []
     for asset_def in self.__assets.values():
-      asset_def.node.save()
\ No newline at end of file
+      asset_type = [atype.name for atype in AssetType\
+                    if atype.value == asset_def.node.__class__]
+      records.append({'type': asset_type[0],
+                      'node': node_to_record(asset_def.node)})
+    return {'assets': records}
+
+  @classmethod
+  def from_records(cls, records:Dict) -> 'AssetsData':
+    assets_collection = {}
+    for record in records['assets']:
+      node_class = AssetType[record['type']]
+      asset_node = node_class(**record['node'])
+      assets_collection[asset_node.uid] = BasicDefinition(asset_node)
+
+    return cls(assets_collection)
+
+  @classmethod
+  def from_database(cls, build:str=None) -> 'AssetsData':
+    assets_collection = {}
+    for atype in AssetType:
+      for asset_node in build_nodes(atype.value, build):
+        assets_collection[asset_node.uid] = BasicDefinition(asset_node)
+    return cls(assets_collection)
+
+  def save_data(self, backend:Backend):
+    def save_assets(batch:List[BasicDefinition]):
+      backend.save_nodes([asset_def.node for asset_def in batch])
+
+    backend.write_batches('assets', self.__assets.values(), save_assets)
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""benchmark of the import time of the command generation
+
+the command generation (mars.register.COMMAND_REGISTER, model.action.Action.get_commands)
+is imported by the sequencer workers, it must not import the build stack.
+each measure runs in a new interpreter, the benchmark fails (exit code 1)
+if a build module is imported or if the median import time exceeds the budget.
+
+usage: python -m benchmarks.import_time [--runs N] [--budget SECONDS]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules of the build stack, not allowed in the command generation imports
+BUILD_MODULES = ['pandas', 'numpy', 'pymongo', 'bson', 'yaml', 'neomodel', 'tqdm', 'zmq', 'pyparsing']
+
+MEASURE = f"""
+import json, sys
+from time import perf_counter
+start = perf_counter()
+from mars.register import COMMAND_REGISTER
+from model.action import Action
+duration = perf_counter() - start
+print(json.dumps({{'time': duration,
+                  'modules': len(sys.modules),
+                  'build_modules': [m for m in {BUILD_MODULES!r} if m in sys.modules]}}))
+"""
+
+def measure() -> Dict:
+  """function to measure the imports in a new interpreter
+
+  Returns:
+      Dict: import time in seconds, number of modules loaded, build modules loaded
+  """
+  output = subprocess.run([sys.executable, '-c', MEASURE],
+                          cwd=ROOT,
+                          capture_output=True,
+                          text=True,
+                          check=True).stdout
+  return json.loads(output.strip().splitlines()[-1])
+
+def main(argv:List[str]=None) -> int:
+  parser = argparse.ArgumentParser(description='import time of the command generation')
+  parser.add_argument('--runs', type=int, default=10, help='number of measures')
+  parser.add_argument('--budget', type=float, default=0.1,
+                      help='maximum median import time in seconds')
+  args = parser.parse_args(argv)
+
+  measures = [measure() for _ in range(args.runs)]
+  times = [m['time'] for m in measures]
+  build_modules = sorted(set([module for m in measures for module in m['build_modules']]))
+  median = statistics.median(times)
+
+  print(f'command generation import : median {median*1000:.1f} ms, '
+        f'min {min(times)*1000:.1f} ms, max {max(times)*1000:.1f} ms, '
+        f'{measures[0]["modules"]} modules loaded')
+
+  failed = False
+  if build_modules:
+    print(f'build modules imported : {", ".join(build_modules)}')
+    failed = True
+  if median > args.budget:
+    print(f'median import time over the budget of {args.budget*1000:.0f} ms')
+    failed = True
+
+  return 1 if failed else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,95 @@
+"""end to end scaling benchmark
+
+for each scale factor, generate a synthetic dataset (benchmarks.synthetic) and run
+the full build with an offline save (export bundle) in a new process, then report
+for each stage the wall time, the cpu time, the rows out and the memory peak
+(tracemalloc, the stages run one at a time), and for each scale the total time
+and the maximum resident memory of the process.
+
+usage: python -m benchmarks.scaling [--scales 1 10 100] [--workspace ./.build/scaling]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from time import perf_counter
+from typing import Dict, List
+from benchmarks.synthetic import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAVE_DATA = os.path.join(ROOT, 'save_data.py')
+WORKSPACE = os.path.join(ROOT, '.build', 'scaling')
+
+def run_scale(scale:int, workspace:str) -> Dict:
+  """function to build and export a synthetic dataset in a new process
+
+  Args:
+      scale (int): scale factor
+      workspace (str): benchmark directory, a sub directory is used by scale
+
+  Returns:
+      Dict: the run report, with the total time and the maximum resident memory (bytes)
+  """
+  directory = os.path.join(workspace, f'x{scale}')
+  # save_data reads ./data and writes ./.build, relative to the working directory
+  generate(scale, os.path.join(directory, 'data'))
+
+  report_file = os.path.join(directory, 'report.json')
+  command = [sys.executable, SAVE_DATA,
+             '--export', os.path.join(directory, 'bundle'),
+             '--no-cache',
+             '--workers', '1',
+             '--trace-memory',
+             '--report', report_file]
+
+  start = perf_counter()
+  process = subprocess.Popen(command, cwd=directory, stdout=subprocess.DEVNULL)
+  # wait4 gives the resource usage of this process only
+  _, status, usage = os.wait4(process.pid, 0)
+  process.returncode = os.waitstatus_to_exitcode(status)
+  duration = perf_counter() - start
+
+  if process.returncode != 0:
+    raise RuntimeError(f'build x{scale} failed (exit code {process.returncode}), run {" ".join(command)} in {directory}')
+
+  with open(report_file, 'r') as f:
+    report = json.load(f)
+  report['scale'] = scale
+  report['total_time'] = round(duration, 3)
+  # ru_maxrss is in kilobytes on linux
+  report['max_rss'] = usage.ru_maxrss * 1024
+  return report
+
+def print_report(report:Dict):
+  print(f"x{report['scale']} : {report['total_time']:.1f} s, "
+        f"max rss {report['max_rss'] / 2**20:.0f} MB")
+  print(f"  {'stage':<24}{'wall (s)':>10}{'cpu (s)':>10}{'rows out':>10}{'peak (MB)':>11}")
+  stages = sorted(report['stages'].items(), key=lambda item: -item[1]['wall_time'])
+  for name, stage in stages:
+    rows_out = stage['rows_out'] if stage['rows_out'] is not None else '-'
+    peak = stage.get('peak_memory', 0) / 2**20
+    print(f"  {name:<24}{stage['wall_time']:>10.3f}{stage['cpu_time']:>10.3f}{rows_out:>10}{peak:>11.1f}")
+
+def main(argv:List[str]=None) -> int:
+  parser = argparse.ArgumentParser(description='build time and memory by scale factor')
+  parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                      help='scale factors to run (ex: 1 10 100 1000)')
+  parser.add_argument('--workspace', default=WORKSPACE,
+                      help=f'directory of the datasets and reports (default {WORKSPACE})')
+  args = parser.parse_args(argv)
+
+  reports = []
+  for scale in args.scales:
+    report = run_scale(scale, args.workspace)
+    print_report(report)
+    reports.append(report)
+
+  summary_file = os.path.join(args.workspace, 'scaling.json')
+  with open(summary_file, 'w') as f:
+    json.dump(reports, f, indent=2)
+  print(f'scaling reports in {summary_file}')
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
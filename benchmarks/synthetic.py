@@ -0,0 +1,114 @@
+"""synthetic dataset generator
+
+generate a data directory with the same files as ./data, the fasteners
+and the work movements duplicated scale times to simulate a larger structure:
+  - each copy of a fastener gets a new name suffix (<reference>.<n + copy * stride>),
+    a new id and is moved of copy frames pitch along x, on its side of the crossbeam
+  - each copy of a work movement (web and flange) targets the copy of its fastener
+  - the parts, the rail movements (station, approach, clearance are one per rail area),
+    the change configuration movements and the yaml configurations are copied as is,
+    the build model has one part and rail movement set per rail
+
+usage: python -m benchmarks.synthetic --scale 10 --output ./synthetic/x10
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, 'data')
+
+FASTENERS = 'fasteners.json'
+MOVEMENTS = ['web_injestion.csv', 'flange_injestion.csv']
+COPIED = ['parts.csv', 'change_conf_injestion.csv',
+          'assets.yaml', 'manipulations.yaml', 'movements.yaml']
+
+# distance between two frames of the fuselage section (mm)
+FRAME_PITCH = 533.4
+
+def name_stride(fasteners:List[Dict]) -> int:
+  """function to get the step between the name suffixes of two copies of a fastener
+
+  Args:
+      fasteners (List[Dict]): the fasteners of the source dataset
+
+  Returns:
+      int: a power of 10 greater than all the name suffixes
+  """
+  suffix = max([int(fastener['Name'].rsplit('.', 1)[1]) for fastener in fasteners])
+  stride = 10
+  while stride <= suffix:
+    stride *= 10
+  return stride
+
+def generate_fasteners(fasteners:List[Dict], scale:int, stride:int) -> List[Dict]:
+  generated = []
+  for copy in range(scale):
+    for fastener in fasteners:
+      if copy == 0:
+        generated.append(fastener)
+        continue
+
+      reference, suffix = fastener['Name'].rsplit('.', 1)
+      xe = float(fastener['Xe'])
+      # keep the fastener on its side of the crossbeam (front x < 0, rear x > 0)
+      side = 1 if xe > 0 else -1
+
+      generated.append(dict(fastener,
+                            Name=f'{reference}.{int(suffix) + copy * stride}',
+                            Id=str(int(fastener['Id']) * 100000 + copy),
+                            Xe=str(xe + side * copy * FRAME_PITCH)))
+  return generated
+
+def generate_movements(rows:List[Dict], scale:int, stride:int) -> List[Dict]:
+  generated = list(rows)
+  works = [row for row in rows if row['mvt'] == 'work']
+  for copy in range(1, scale):
+    for row in works:
+      generated.append(dict(row, id=str(int(row['id']) + copy * stride)))
+  return generated
+
+def generate(scale:int, output:str, source:str=DATA):
+  """function to generate a synthetic data directory
+
+  Args:
+      scale (int): scale factor, number of copies of the fasteners and work movements
+      output (str): directory to write
+      source (str, optional): source data directory. Defaults to ./data.
+  """
+  os.makedirs(output, exist_ok=True)
+
+  with open(os.path.join(source, FASTENERS), 'r') as f:
+    fasteners = json.load(f)
+  stride = name_stride(fasteners)
+
+  with open(os.path.join(output, FASTENERS), 'w') as f:
+    json.dump(generate_fasteners(fasteners, scale, stride), f)
+
+  for movements_file in MOVEMENTS:
+    with open(os.path.join(source, movements_file), 'r', newline='') as f:
+      reader = csv.DictReader(f)
+      columns = reader.fieldnames
+      rows = list(reader)
+
+    with open(os.path.join(output, movements_file), 'w', newline='') as f:
+      writer = csv.DictWriter(f, fieldnames=columns)
+      writer.writeheader()
+      writer.writerows(generate_movements(rows, scale, stride))
+
+  for copied_file in COPIED:
+    shutil.copyfile(os.path.join(source, copied_file),
+                    os.path.join(output, copied_file))
+
+  print(f'synthetic dataset x{scale} : {len(fasteners) * scale} fasteners in {output}')
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='generate a synthetic dataset')
+  parser.add_argument('--scale', type=int, required=True, help='scale factor (ex: 10, 100, 1000)')
+  parser.add_argument('--output', required=True, help='directory to write')
+  parser.add_argument('--source', default=DATA, help=f'source data directory (default {DATA})')
+  args = parser.parse_args()
+  generate(args.scale, args.output, args.source)
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import pickle
+from typing import Any, Dict, List, Tuple
+
+def hash_file(file_path:str) -> str:
+  """function to get the sha256 hash of a file content
+
+  Args:
+      file_path (str): path of the file
+
+  Returns:
+      str: hexadecimal hash of the file content
+  """
+  file_hash = hashlib.sha256()
+  with open(file_path, 'rb') as f:
+    for chunk in iter(lambda: f.read(65536), b''):
+      file_hash.update(chunk)
+  return file_hash.hexdigest()
+
+class BuildCache:
+  """Class used to store the stages results between two runs
+
+  each result is stored with the stage key, a hash of the stage input files,
+  of the source files of the stage code and of the keys of the stages before it.
+  a stage whose key did not change is skipped and its cached result reused.
+  all the results are stored in a single pickle file to keep the references
+  shared between the stages results (ex: part nodes used by the assemblies).
+  """
+
+  # update the version when the code outside the stages sources changes to invalidate the cache
+  VERSION = 1
+
+  def __init__(self, cache_file:str):
+    self.__cache_file = cache_file
+    self.__entries:Dict[str, Tuple[str, Any]] = {}
+    self.__file_hashes:Dict[str, str] = {}
+
+    if os.path.exists(cache_file):
+      try:
+        with open(cache_file, 'rb') as f:
+          self.__entries = pickle.load(f)
+      except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as error:
+        print(f'build cache {cache_file} not readable, full rebuild : {error}')
+        self.__entries = {}
+
+  def __hash_file(self, file_path:str) -> str:
+    if file_path not in self.__file_hashes:
+      self.__file_hashes[file_path] = hash_file(file_path)
+    return self.__file_hashes[file_path]
+
+  def stage_key(self, name:str, files:List[str], dependencies_keys:List[str], sources:List[str]=None) -> str:
+    """function to compute the key of a stage
+
+    Args:
+        name (str): stage name
+        files (List[str]): paths of the stage input files
+        dependencies_keys (List[str]): keys of the stages before it
+        sources (List[str], optional): paths of the source files of the stage code. Defaults to None.
+
+    Returns:
+        str: hexadecimal stage key
+    """
+    key = hashlib.sha256()
+    key.update(f'{self.VERSION}:{name}'.encode())
+    for file_path in files:
+      key.update(f'{file_path}:{self.__hash_file(file_path)}'.encode())
+    for dependency_key in dependencies_keys:
+      key.update(dependency_key.encode())
+    # the sources are hashed by content only, the key does not depend on the install path
+    for source in sources or []:
+      key.update(f'source:{self.__hash_file(source)}'.encode())
+    return key.hexdigest()
+
+  def get(self, name:str, key:str) -> Tuple[bool, Any]:
+    entry = self.__entries.get(name)
+    if entry and entry[0] == key:
+      return True, entry[1]
+    return False, None
+
+  def latest(self, name:str) -> Tuple[bool, Any]:
+    """function to get the last result stored for a stage, whatever its key
+
+    Args:
+        name (str): stage name
+
+    Returns:
+        Tuple[bool, Any]: True if a result is stored, the result
+    """
+    entry = self.__entries.get(name)
+    if entry:
+      return True, entry[1]
+    return False, None
+
+  def put(self, name:str, key:str, result:Any):
+    self.__entries[name] = (key, result)
+
+  def dump(self):
+    directory = os.path.dirname(self.__cache_file)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    # write in a temporary file then replace to never leave a partial cache
+    tmp_file = self.__cache_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+      pickle.dump(self.__entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, self.__cache_file)
@@ -1,7 +1,5 @@
-from msilib.schema import Error
 from typing import List, Dict
 import pandas as pd
-from pyparsing import col
 
 def build(source_file:str, ftype:str):
   try:
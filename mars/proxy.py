@@ -2,7 +2,6 @@
 from enum import Enum, EnumMeta
 import uuid
 
-from zmq import SUBSCRIBE
 from model.definition import Manipulation
 from typing import List, Dict, Union, Tuple
 from copy import deepcopy
@@ -26,7 +26,7 @@ class Action:
     Attributes
     ----------
     id : str
-        the action id
+        the action id (ObjectId hexadecimal string, _id of the action document)
     dependencies : List[Action]
         list of dependencies actions
     next : List[Action]
@@ -58,7 +58,7 @@ class Action:
         """Action object initializer
 
         Args:
-            id (str): unique action id
+            id (str): unique action id, an ObjectId allocated by the client
             atype (str): action type
             definition (object): action definition according action type
             description (str): human readable description
@@ -1,8 +1,12 @@
 from enum import Enum
-from typing import Dict, List, Tuple
-import numpy as np
+from typing import Dict, List, Tuple, TYPE_CHECKING
 import abc
 
+# numpy is only needed to parse positions, it is imported when used
+# to keep the command generation light to import
+if TYPE_CHECKING:
+    import numpy as np
+
 class MovementType(Enum):
     """Path type enumeration
 
@@ -120,7 +124,7 @@ class Position:
     __metaclass__ = abc.ABCMeta
 
     def __init__(self,
-                 pvector: np.array,
+                 pvector: 'np.array',
                  ptype: PositionType,
                  e1: int,
                  config: Configuration = None,
@@ -138,7 +142,7 @@ class Position:
             uf: always to 0
         """
 
-        self._vector: np.array = pvector
+        self._vector: 'np.array' = pvector
         self.__type: PositionType = ptype
         self.__config: Configuration = config
         self.__e1: int = e1
@@ -216,7 +220,7 @@ class PositionCrt(Position):
     """ Class used to represent a Position in cartesian representation
     Inherit from Position Class"""
 
-    def __init__(self, pvector: np.array,
+    def __init__(self, pvector: 'np.array',
                  e1: int,
                  config: Configuration) -> 'PositionCrt':
         """PositionCrt object initializer
@@ -239,6 +243,7 @@ class PositionCrt(Position):
 
         svector = serialize_crtpos['vector']
         vector_array = [svector[key] for key in cls._VECTOR_KEYS]
+        import numpy as np
         vector = np.array(vector_array)
 
         return cls(vector, e1, config)
@@ -251,7 +256,7 @@ class PositionJoint(Position):
     """ Class used to represent a Position in joint representation
     Inherit from Position Class"""
 
-    def __init__(self, pvector: np.array, e1: int):
+    def __init__(self, pvector: 'np.array', e1: int):
         """[summary]
 
         Args:
@@ -271,6 +276,7 @@ class PositionJoint(Position):
 
         svector = serialize_jntpos['vector']
         vector_array = [svector[key] for key in cls._VECTOR_KEYS]
+        import numpy as np
         vector = np.array(vector_array)
 
         return cls(vector, e1)
@@ -4,21 +4,25 @@ from typing import Dict, List, NewType
 import re
 from unittest import result
 from assemblies import AssembliesData, AssemblyDefinition
+from pattern import PatternData
 from neo4mars.process.operation import Class as OClass, Instance as OInstance
 from states import PreconditionRS, Relation, ResultRS, SCDefinition
-from tqdm import tqdm
 
-from utils import BasicDefinition, InstanceDefinition
+from utils import BasicDefinition, InstanceDefinition, node_to_record
+from persistence import Backend
 
 class OpInstanceDefinition(SCDefinition, InstanceDefinition):
   def __init__(self,
                node:OInstance,
                mother_node:OClass,
                preconditions:List[PreconditionRS],
-               results:List[ResultRS]):
+               results:List[ResultRS],
+               rail:str=None):
 
     InstanceDefinition.__init__(self, node, mother_node)
     SCDefinition.__init__(self, node, preconditions, results)
+    # rail of the assembly, the operations are written by rail
+    self.__rail = rail
     '''self.__node = node
     self.__mother_node = mother_node
     self.__preconditions = preconditions
@@ -45,6 +49,10 @@ class OpInstanceDefinition(SCDefinition, InstanceDefinition):
   def target_reference(self):
     return self.__target_ref'''
 
+  @property
+  def rail(self):
+    return self.__rail
+
 class OperationType(Enum):
   DRILL = 'D', "no_drill", "drill", "drilled"
   FASTEN = 'F', "no_fasten", "fasten", "fastened"
@@ -80,6 +88,9 @@ class OperationsData:
   def instances(self):
     return self.__instances
 
+  def __len__(self):
+    return len(self.__classes) + len(self.__instances)
+
   @staticmethod
   def generate_uid(operation_type:OperationType, element_ref:str):
     return f'{operation_type.code}{element_ref}'.lower()
@@ -130,7 +141,8 @@ class OperationsData:
     return OpInstanceDefinition(node=node,
                                mother_node=mother_node,
                                preconditions=[precondition],
-                               results=[result])
+                               results=[result],
+                               rail=PatternData.rail_of(assy_definition))
 
 
   @classmethod
@@ -173,27 +185,81 @@ class OperationsData:
     
     return cls(class_collection, instance_collection)
 
-  def save_data(self):
+  def to_records(self) -> Dict:
+    instance_records = []
+    for key, op_def in self.__instances.items():
+      instance_records.append({'key': key,
+                               'node': node_to_record(op_def.node),
+                               'mother': op_def.mother_node.uid,
+                               'preconditions': [precond.to_record() for precond in op_def.preconditions],
+                               'results': [result.to_record() for result in op_def.results]})
+    return {
+      'classes': [node_to_record(bdef.node) for bdef in self.__classes.values()],
+      'instances': instance_records
+    }
+
+  @classmethod
+  def from_records(cls, records:Dict, assemblies_data:AssembliesData) -> 'OperationsData':
+    class_collection = {}
+    for record in records['classes']:
+      class_collection[record['uid']] = BasicDefinition(OClass(**record))
+
+    # preconditions and results are relative to the assemblies nodes
+    assy_nodes = dict([(assy_def.node.uid, assy_def.node)\
+                       for assy_def in assemblies_data.assemblies.values()])
+    assy_rails = dict([(assy_def.node.uid, PatternData.rail_of(assy_def))\
+                       for assy_def in assemblies_data.assemblies.values()])
+
+    instance_collection = {}
+    for record in records['instances']:
+      class_def = class_collection.get(record['mother'])
+      assert class_def, f"{record['mother']} not found in class_collection"
+
+      preconditions = [PreconditionRS.from_record(precond, assy_nodes)\
+                       for precond in record['preconditions']]
+      results = [ResultRS.from_record(result, assy_nodes)\
+                 for result in record['results']]
+
+      rail = assy_rails.get(preconditions[0].property_node.uid) if preconditions else None
+      instance_collection[record['key']] = OpInstanceDefinition(node=OInstance(**record['node']),
+                                                                mother_node=class_def.node,
+                                                                preconditions=preconditions,
+                                                                results=results,
+                                                                rail=rail)
+
+    return cls(class_collection, instance_collection)
+
+  def save_data(self, backend:Backend):
     print('save operations nodes')
     print('save class nodes')
-    for bdef in tqdm(self.__classes.values()):
-      bdef.node.save()
+    def save_classes(batch:List[BasicDefinition]):
+      backend.save_nodes([bdef.node for bdef in batch])
+
+    backend.write_batches('operations.classes', self.__classes.values(), save_classes)
     
     print('save and connect instance nodes')
-    for op_def in tqdm(self.__instances.values()):
-      node = op_def.node
-      mother_node = op_def.mother_node
-      preconditions = op_def.preconditions
-      results = op_def.results
+    def save_instances(batch:List[OpInstanceDefinition]):
+      backend.save_nodes([op_def.node for op_def in batch])
 
-      node.save()
-      node.mother_class.connect(mother_node)
+      relationships = []
+      for op_def in batch:
+        node = op_def.node
+        mother_node = op_def.mother_node
+        preconditions = op_def.preconditions
+        results = op_def.results
 
-      for precond in preconditions:
-        node.preconditions.connect(precond.property_node, precond.definition)
-      
-      for result in results:
-        node.results.connect(result.property_node, result.definition)
+        relationships.append((node, 'mother_class', mother_node))
+
+        for precond in preconditions:
+          relationships.append((node, 'preconditions', precond.property_node, precond.definition))
+        
+        for result in results:
+          relationships.append((node, 'results', result.property_node, result.definition))
+
+      backend.connect_nodes(relationships)
+
+    backend.write_batches('operations.instances', self.__instances.values(), save_instances,
+                          lambda op_def: op_def.rail)
     
 
       
@@ -1,10 +1,10 @@
 import pandas as pd
 import df_functions as dff
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 from neo4mars.product.part import Instance, Class
-from tqdm import tqdm
 
-from utils import BasicDefinition, InstanceDefinition
+from utils import BasicDefinition, InstanceDefinition, node_to_record
+from persistence import Backend
 
 def get_element_name(code:str, el_type:str):
     if el_type == "instance":   
@@ -24,6 +24,9 @@ class PartsData:
   COLUMNS = ['element_code', 'parent', 'path', 'rail', 'reference']
   ELEMENT_CODE = ['ed', 'eg', 'eq', 'rar', 'rav', 'tr']
   RAIL_ID = [1,2,3,4,5,6]
+  # the crossbeam is a single part instance (area c35) shared by the rails
+  CROSSBEAM = 'crossbeam'
+  CROSSBEAM_AREA = 'c35'
 
   def __init__(self,
       classes_collection:Dict[str, BasicDefinition],
@@ -42,6 +45,9 @@ class PartsData:
   def instances(self):
     return self.__instances
 
+  def __len__(self):
+    return len(self.__classes) + len(self.__instances)
+
   def get_element(self, description:str, rail:str) -> str:
     return self.__refbyareas.loc[(description, rail), 'reference']
 
@@ -56,6 +62,11 @@ class PartsData:
       uid = part_ref+area_ref
     
     return uid.lower()
+
+  @classmethod
+  def is_shared_instance(cls, node) -> bool:
+    # the instance description is '<element name> <area>' (ex: crossbeam c35)
+    return isinstance(node, Instance) and node.description == f"{cls.CROSSBEAM} {cls.CROSSBEAM_AREA}"
     
 
   @classmethod
@@ -94,12 +105,12 @@ class PartsData:
     
     # crossbeam data duplicated so i need to have only one row
     # get the crossbeam ref
-    crossbeam_ref = instance_df.loc['crossbeam'].iloc[0].reference.lower()
+    crossbeam_ref = instance_df.loc[cls.CROSSBEAM].iloc[0].reference.lower()
     # delete the crossbeam data
-    instance_df.drop('crossbeam', inplace=True)
+    instance_df.drop(cls.CROSSBEAM, inplace=True)
 
     # create only one row for crossbeam with ref
-    instance_df.loc[('crossbeam', 'c35'), 'reference'] = crossbeam_ref
+    instance_df.loc[(cls.CROSSBEAM, cls.CROSSBEAM_AREA), 'reference'] = crossbeam_ref
     
     return class_df, instance_df
 
@@ -167,19 +178,57 @@ class PartsData:
     #return an PartData object 
     return cls(class_collection, instance_collection, instance_df)
 
-  def save_data(self)->None:
+  def to_records(self) -> Dict:
+    return {
+      'classes': [node_to_record(bdef.node) for bdef in self.__classes.values()],
+      'instances': [{'node': node_to_record(instance_def.node),
+                     'mother': instance_def.mother_node.uid}\
+                    for instance_def in self.__instances.values()],
+      'refbyareas': self.__refbyareas.reset_index().to_dict('records')
+    }
+
+  @classmethod
+  def from_records(cls, records:Dict) -> 'PartsData':
+    class_collection = {}
+    for record in records['classes']:
+      class_collection[record['uid']] = BasicDefinition(Class(**record))
+
+    instance_collection = {}
+    for record in records['instances']:
+      class_def = class_collection.get(record['mother'])
+      assert class_def, f"{record['mother']} not found in class_collection"
+
+      node = Instance(**record['node'])
+      instance_collection[node.uid] = InstanceDefinition(node=node,
+                                                         mother_node=class_def.node)
+
+    refbyareas = pd.DataFrame.from_records(records['refbyareas'])\
+                   .set_index(['ename', 'rail'])
+
+    return cls(class_collection, instance_collection, refbyareas)
+
+  def save_data(self, backend:Backend)->None:
     print('save parts nodes')
     print('save class nodes')
     # save the class nodes in neo4j
-    for bdef in tqdm(self.__classes.values()):
-      bdef.node.save()
+    def save_classes(batch:List[BasicDefinition]):
+      backend.save_nodes([bdef.node for bdef in batch])
+
+    backend.write_batches('parts.classes', self.__classes.values(), save_classes)
     
     print('save instance nodes')
     # save the instance nodes in neo4j
     # and create connexion between class and instances
-    for instance_def in tqdm(self.__instances.values()):
-      node = instance_def.node
-      mother_node = instance_def.mother_node
-      
-      node.save()
-      node.mother_class.connect(mother_node)
\ No newline at end of file
+    def save_instances(batch:List[InstanceDefinition]):
+      backend.save_nodes([instance_def.node for instance_def in batch])
+
+      relationships = []
+      for instance_def in batch:
+        node = instance_def.node
+        mother_node = instance_def.mother_node
+        
+        relationships.append((node, 'mother_class', mother_node))
+
+      backend.connect_nodes(relationships)
+
+    backend.write_batches('parts.instances', self.__instances.values(), save_instances)
\ No newline at end of file
@@ -1,8 +1,8 @@
-from typing import Dict
+from typing import Dict, List
 from neo4mars.process.area import Area
-from tqdm import tqdm
 
-from utils import BasicDefinition
+from utils import BasicDefinition, node_to_record
+from persistence import Backend, build_nodes
 
 class PatternData:
 
@@ -16,6 +16,9 @@ class PatternData:
   def areas(self):
     return self.__areas
 
+  def __len__(self):
+    return len(self.__areas)
+
   @classmethod
   def build(cls):
     area_collection = {}
@@ -56,7 +59,45 @@ class PatternData:
 
     return cls(area_collection)
 
-  def save_data(self):
+  def to_records(self) -> Dict:
+    return {
+      'areas': [node_to_record(area_def.node) for area_def in self.__areas.values()]
+    }
+
+  @classmethod
+  def from_records(cls, records:Dict) -> 'PatternData':
+    area_collection = {}
+    for record in records['areas']:
+      area_collection[record['uid']] = BasicDefinition(Area(**record))
+
+    return cls(area_collection)
+
+  @classmethod
+  def rail_of(cls, definition) -> str:
+    """function to get the rail of a definition located on the pattern areas
+    (used to partition the writes by rail)
+
+    Args:
+        definition : definition with a pattern (list of areas definitions)
+
+    Returns:
+        str: uid of the rail area, None if the definition is not on a rail
+    """
+    for area_def in getattr(definition, 'pattern', []):
+      if area_def.node.uid in cls.RAILS:
+        return area_def.node.uid
+    return None
+
+  @classmethod
+  def from_database(cls, build:str=None) -> 'PatternData':
+    # the areas of the build read by the sequencer
+    area_collection = dict([(area.uid, BasicDefinition(area))\
+                            for area in build_nodes(Area, build)])
+    return cls(area_collection)
+
+  def save_data(self, backend:Backend):
     print('save pattern nodes')
-    for area_def in tqdm(self.__areas.values()):
-      area_def.node.save()
+    def save_areas(batch:List[BasicDefinition]):
+      backend.save_nodes([area_def.node for area_def in batch])
+
+    backend.write_batches('areas', self.__areas.values(), save_areas)
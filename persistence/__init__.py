@@ -0,0 +1,13 @@
+from persistence.backend import Backend
+from persistence.live import LiveBackend
+from persistence.export import ExportBackend, DOCUMENTS_FORMATS, load_bundle, read_dump, write_dump
+from persistence.admin_import import AdminImportBackend
+from persistence.delta import DeltaBackend, DeltaException, DeltaExceptionType, GraphDelta
+from persistence.instrumented import InstrumentedBackend
+from persistence.journal import WriteJournal, JournalException, JournalExceptionType
+from persistence.journaled import JournaledBackend
+from persistence.schema import bootstrap_schema, bootstrap_indexes, document_indexes, node_labels, versioned_labels,\
+                               SchemaException, SchemaExceptionType
+from persistence.queries import ActionQueries
+from persistence.tracing import trace_round_trips
+from persistence.versions import BuildRegistry, BuildException, BuildExceptionType, build_nodes, new_build_id, versioned_collection
@@ -0,0 +1,216 @@
+import csv
+import glob
+import os
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Tuple
+from bson import ObjectId
+from neomodel import ArrayProperty, BooleanProperty, DateTimeProperty, FloatProperty, IntegerProperty
+from neomodel.core import StructuredNode
+from neomodel.contrib.spatial_properties import PointProperty
+from persistence.backend import Backend
+from persistence.export import DOCUMENTS_DIR, DUMP_DIR, write_documents, write_dump
+from persistence.graph import node_properties, relationship_properties, relationship_type
+
+NODES_DIR = 'nodes'
+RELATIONSHIPS_DIR = 'relationships'
+IMPORT_SCRIPT = 'import.sh'
+ARRAY_DELIMITER = ';'
+
+# neo4j-admin import types of the neomodel properties, checked in order
+PROPERTY_TYPES = [(BooleanProperty, 'boolean'),
+                  (IntegerProperty, 'int'),
+                  (FloatProperty, 'float'),
+                  # deflated as a timestamp
+                  (DateTimeProperty, 'float')]
+
+def property_type(prop) -> str:
+  """function to get the neo4j-admin import type of a neomodel property
+
+  Args:
+      prop (Property): the neomodel property
+
+  Returns:
+      str: the type of the column header (ex: int, float[], point)
+  """
+  if isinstance(prop, PointProperty):
+    return 'point'
+  if isinstance(prop, ArrayProperty):
+    base_property = getattr(prop, 'base_property', None)
+    return (property_type(base_property) if base_property else 'string') + '[]'
+  for property_class, import_type in PROPERTY_TYPES:
+    if isinstance(prop, property_class):
+      return import_type
+  return 'string'
+
+def value_type(value:Any) -> str:
+  """function to get the neo4j-admin import type of a relationship property value
+
+  Args:
+      value (Any): the property value
+
+  Returns:
+      str: the type of the column header
+  """
+  if isinstance(value, (list, tuple)):
+    return (value_type(value[0]) if value else 'string') + '[]'
+  if isinstance(value, bool):
+    return 'boolean'
+  if isinstance(value, int):
+    return 'int'
+  if isinstance(value, float):
+    return 'float'
+  return 'string'
+
+def format_value(value:Any) -> str:
+  if value is None:
+    return ''
+  if isinstance(value, (list, tuple)):
+    return ARRAY_DELIMITER.join([format_value(v) for v in value])
+  if isinstance(value, bool):
+    return 'true' if value else 'false'
+  if isinstance(value, dict):
+    # point value, ex: {x:1.0, y:2.0, z:3.0, crs:'cartesian-3d'}
+    return '{' + ', '.join([f"{key}:'{v}'" if isinstance(v, str) else f'{key}:{v}'\
+                            for key, v in value.items()]) + '}'
+  return str(value)
+
+class AdminImportBackend(Backend):
+  """Backend writing the graph as the csv files of the neo4j-admin import tool
+  (cold load of an empty database), the documents as in an export bundle
+
+  the directory contains:
+    - nodes/<label>.csv : one file by node class, the uid is the node id in the label id space
+    - relationships/<start label>-<type>-<end label>.csv
+    - mongo/<collection>.ndjson : the documents, in mongodb extended json (mongoimport format)
+    - or with the bson documents format, dump/ : the documents as a mongodump directory
+    - import.sh : the neo4j-admin command importing the csv files
+  the column headers are typed from the neomodel properties
+  (ex: origin:point, orient:int[], the arrays separated by ;).
+  """
+  def __init__(self, directory:str, documents_format:str='ndjson', database:str=None):
+    self.__directory = directory
+    self.__documents_format = documents_format
+    self.__database = database
+    self.__nodes:Dict[type, List[StructuredNode]] = {}
+    self.__relationships:Dict[Tuple[str, str, str], List[Dict]] = {}
+    self.__documents:Dict[str, List[Dict]] = {}
+    self.__keys:Dict[str, Tuple[str, ...]] = {}
+    self.__lock = Lock()
+
+  def save_node(self, node:StructuredNode):
+    with self.__lock:
+      self.__nodes.setdefault(node.__class__, []).append(node)
+
+  def connect(self,
+              node:StructuredNode,
+              relationship:str,
+              end_node:StructuredNode,
+              properties:Dict=None):
+    rel_type, outgoing = relationship_type(node, relationship)
+    start, end = (node, end_node) if outgoing else (end_node, node)
+
+    key = (start.__label__, rel_type, end.__label__)
+    row = {'start': start.uid,
+           'end': end.uid,
+           'properties': relationship_properties(properties)}
+    with self.__lock:
+      self.__relationships.setdefault(key, []).append(row)
+
+  def save_documents(self, collection:str, documents:Iterable[Dict], keys:Tuple[str, ...]=None) -> List[str]:
+    documents = [{'_id': ObjectId(), **document} for document in documents]
+    with self.__lock:
+      self.__documents.setdefault(collection, []).extend(documents)
+      if keys:
+        self.__keys[collection] = keys
+    return [str(document['_id']) for document in documents]
+
+  @staticmethod
+  def __write_csv(file_path:str, header:List[str], rows:List[List[str]]):
+    with open(file_path, 'w', newline='') as f:
+      writer = csv.writer(f)
+      writer.writerow(header)
+      writer.writerows(rows)
+
+  def __write_nodes(self, nodes_dir:str) -> List[str]:
+    files = []
+    for node_class, nodes in sorted(self.__nodes.items(), key=lambda item: item[0].__label__):
+      label = node_class.__label__
+      definitions = node_class.defined_properties(aliases=False, rels=False)
+      names = [name for name in definitions if name != 'uid']
+
+      header = [f'uid:ID({label})', ':LABEL']\
+               + [f'{name}:{property_type(definitions[name])}' for name in names]
+      labels = ARRAY_DELIMITER.join(node_class.inherited_labels())
+
+      rows = []
+      for node in sorted(nodes, key=lambda node: str(node.uid)):
+        properties, points = node_properties(node)
+        properties.update(points)
+        rows.append([format_value(node.uid), labels]\
+                    + [format_value(properties.get(name)) for name in names])
+
+      file_path = os.path.join(nodes_dir, f'{label}.csv')
+      self.__write_csv(file_path, header, rows)
+      files.append(file_path)
+    return files
+
+  def __write_relationships(self, relationships_dir:str) -> List[str]:
+    files = []
+    for key in sorted(self.__relationships.keys()):
+      start_label, rel_type, end_label = key
+      relationships = self.__relationships[key]
+
+      # the relationship properties are typed from their first value
+      types:Dict[str, str] = {}
+      for relationship in relationships:
+        for name, value in relationship['properties'].items():
+          if value is not None and name not in types:
+            types[name] = value_type(value)
+      names = sorted(types.keys())
+
+      header = [f':START_ID({start_label})', f':END_ID({end_label})', ':TYPE']\
+               + [f'{name}:{types[name]}' for name in names]
+      rows = [[format_value(relationship['start']), format_value(relationship['end']), rel_type]\
+              + [format_value(relationship['properties'].get(name)) for name in names]\
+              for relationship in sorted(relationships, key=lambda row: (str(row['start']), str(row['end'])))]
+
+      file_path = os.path.join(relationships_dir, f'{start_label}-{rel_type}-{end_label}.csv')
+      self.__write_csv(file_path, header, rows)
+      files.append(file_path)
+    return files
+
+  def __write_script(self, nodes_files:List[str], relationships_files:List[str]):
+    # paths relative to the import directory, the script runs from it
+    arguments = [f'  --nodes={os.path.relpath(file, self.__directory)}' for file in nodes_files]\
+                + [f'  --relationships={os.path.relpath(file, self.__directory)}' for file in relationships_files]
+    script = ['#!/bin/sh',
+              '# cold load of an empty database, usage: ./import.sh [database] (default neo4j)',
+              'cd "$(dirname "$0")"',
+              'neo4j-admin database import full \\',
+              f'  --array-delimiter="{ARRAY_DELIMITER}" \\']\
+             + [argument + ' \\' for argument in arguments]\
+             + ['  "${1:-neo4j}"']
+    with open(os.path.join(self.__directory, IMPORT_SCRIPT), 'w') as f:
+      f.write('\n'.join(script) + '\n')
+
+  def close(self):
+    nodes_dir = os.path.join(self.__directory, NODES_DIR)
+    relationships_dir = os.path.join(self.__directory, RELATIONSHIPS_DIR)
+    for directory in [nodes_dir, relationships_dir]:
+      os.makedirs(directory, exist_ok=True)
+      for file in glob.glob(os.path.join(directory, '*.csv')):
+        os.remove(file)
+
+    print(f'write neo4j-admin import files in {self.__directory}')
+    nodes_files = self.__write_nodes(nodes_dir)
+    relationships_files = self.__write_relationships(relationships_dir)
+    self.__write_script(nodes_files, relationships_files)
+
+    if self.__documents_format == 'ndjson':
+      write_documents(os.path.join(self.__directory, DOCUMENTS_DIR), self.__documents)
+    else:
+      write_dump(os.path.join(self.__directory, DUMP_DIR),
+                 self.__database,
+                 self.__documents,
+                 self.__keys,
+                 compress=self.__documents_format == 'bson.gz')
@@ -0,0 +1,148 @@
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Hashable, Iterable, List, Tuple
+from neomodel.core import StructuredNode
+from tqdm import tqdm
+
+# a relationship to write : (node, relationship attribute name, end node[, properties])
+Relationship = Tuple
+
+def keys_index(keys:Tuple[str, ...]) -> Dict:
+  """function to get the unique index of a documents natural key
+  (partial, the documents written without the key are not indexed)
+
+  Args:
+      keys (Tuple[str, ...]): fields of the natural key
+
+  Returns:
+      Dict: the index specification (key, name, unique, partialFilterExpression)
+  """
+  return {'key': dict([(key, 1) for key in keys]),
+          'name': '_'.join(keys) + '_unique',
+          'unique': True,
+          'partialFilterExpression': dict([(key, {'$exists': True}) for key in keys])}
+
+class Backend:
+  """Base class of the persistence backends targeted by the *Data.save_data methods
+
+  the graph is written by nodes (save_node, save_nodes) and by relationships (connect, connect_nodes),
+  the actions are written as documents (save_documents).
+  the writes are grouped in batches (write_batches), each batch written in a transaction.
+  """
+
+  def write_batches(self,
+                    name:str,
+                    definitions:Iterable[Any],
+                    write:Callable[[List[Any]], None],
+                    partition:Callable[[Any], Hashable]=None,
+                    graph:bool=True):
+    """function to write definitions by batches, each batch in a transaction
+    the base backend writes all the definitions in a single batch.
+
+    Args:
+        name (str): name of the written collection (ex: assemblies)
+        definitions (Iterable[Any]): the definitions to write, with a node attribute
+        write (Callable[[List[Any]], None]): function writing a batch of definitions
+        partition (Callable[[Any], Hashable], optional): key of the partition of a definition (ex: its rail),
+          the partitions can be written at the same time. Defaults to None.
+        graph (bool, optional): the batches write graph data, in a graph transaction.
+          Defaults to True (False for the documents).
+    """
+    definitions = list(definitions)
+    if definitions:
+      with tqdm(total=len(definitions)) as progress, (self.transaction() if graph else nullcontext()):
+        write(definitions)
+        progress.update(len(definitions))
+
+  def transaction(self) -> ContextManager:
+    """function to get a context manager writing a batch in a transaction
+
+    Returns:
+        ContextManager: committing at the exit, rolling back on error
+    """
+    return nullcontext()
+
+  def create_schema(self):
+    """function to create the constraints and indexes of the graph before the writes
+    """
+    pass
+
+  @property
+  def transient_errors(self) -> Tuple[type, ...]:
+    """errors of a batch which can succeed if the batch is written again (ex: deadlock)
+    """
+    return ()
+
+  def restore_nodes(self, nodes:List[StructuredNode]):
+    """function to restore the database ids of nodes written by a previous run
+    (nodes of a batch already committed, needed to connect them)
+
+    Args:
+        nodes (List[StructuredNode]): nodes to restore, found by uid
+    """
+    pass
+
+  def save_node(self, node:StructuredNode):
+    """function to write a node
+
+    Args:
+        node (StructuredNode): the node to write
+    """
+    raise NotImplementedError
+
+  def save_nodes(self, nodes:List[StructuredNode]) -> List[int]:
+    """function to write several nodes
+    the base backend writes them one by one (save_node)
+
+    Args:
+        nodes (List[StructuredNode]): the nodes to write
+
+    Returns:
+        List[int]: the database ids of the nodes, in the nodes order (None if not known)
+    """
+    for node in nodes:
+      self.save_node(node)
+    return [getattr(node, 'id', None) for node in nodes]
+
+  def connect(self,
+              node:StructuredNode,
+              relationship:str,
+              end_node:StructuredNode,
+              properties:Dict=None):
+    """function to write a relationship between two nodes
+
+    Args:
+        node (StructuredNode): the node owning the relationship definition
+        relationship (str): name of the relationship attribute in the node class (ex: assemble)
+        end_node (StructuredNode): the node to connect
+        properties (Dict, optional): relationship properties. Defaults to None.
+    """
+    raise NotImplementedError
+
+  def connect_nodes(self, relationships:List[Relationship]):
+    """function to write several relationships
+    the base backend writes them one by one (connect)
+
+    Args:
+        relationships (List[Relationship]): (node, relationship, end node[, properties]) tuples
+    """
+    for relationship in relationships:
+      self.connect(*relationship)
+
+  def save_documents(self, collection:str, documents:Iterable[Dict], keys:Tuple[str, ...]=None) -> List[str]:
+    """function to write documents in a collection
+
+    Args:
+        collection (str): collection name
+        documents (Iterable[Dict]): documents to write (ex: a generator)
+        keys (Tuple[str, ...], optional): natural key of the documents, unique in the collection,
+                                          a document with the same key is replaced. Defaults to None.
+
+    Returns:
+        List[str]: the documents ids, in the documents order
+    """
+    raise NotImplementedError
+
+  def close(self):
+    """function to call when all the data are written
+    """
+    pass
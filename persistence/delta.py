@@ -0,0 +1,288 @@
+import hashlib
+import json
+from collections import Counter
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+from bson import ObjectId, json_util
+from neomodel import db
+from neomodel.core import StructuredNode
+from pymongo import DeleteMany, MongoClient, ReplaceOne
+from exceptions import BaseException, ExceptionType
+from persistence.backend import Backend
+from persistence.schema import bootstrap_schema, versioned_labels
+from persistence.versions import BUILDS_COLLECTION
+from persistence.graph import GraphBuffer, create_nodes_statement, create_relationships_statement, escape
+
+def property_hash(properties:Dict) -> str:
+  """function to hash the properties of a node or a relationship,
+  the same for the built properties and the properties read in neo4j
+
+  Args:
+      properties (Dict): the properties, points as x,y,z,crs dict (built) or neo4j Point (read)
+
+  Returns:
+      str: the hash of the properties
+  """
+  normalized = {}
+  for name, value in properties.items():
+    if isinstance(value, dict):
+      # built point, compared on its coordinates
+      value = [value[axis] for axis in ['x', 'y', 'z'] if axis in value]
+    elif hasattr(value, 'srid'):
+      # neo4j Point (a tuple of its coordinates)
+      value = list(value)
+    normalized[name] = value
+  return hashlib.sha1(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+
+# the nodes of the subclasses have more labels, they are compared with their own class
+EXACT_LABELS = 'all(label IN labels(n) WHERE label IN $labels)'
+
+class DeltaExceptionType(ExceptionType):
+  VERSIONED_DATA = "DELTA_VERSIONED_DATA"
+
+class DeltaException(BaseException):
+  def __init__(self, origin_stack:List[str], type:DeltaExceptionType, description:str):
+    super().__init__(origin_stack,
+                     type,
+                     description)
+
+def document_hash(document:Dict) -> str:
+  return hashlib.sha1(json_util.dumps(document, sort_keys=True).encode()).hexdigest()
+
+class GraphDelta:
+  """Class used to hold the changes between the built graph and the live database
+
+  nodes are identified by their labels and uid, relationships by their type,
+  their start and end uids and the hash of their properties:
+  a relationship with changed properties is deleted and created again.
+  """
+  def __init__(self):
+    # by labels (and point properties names): rows to create, rows to update, uids to delete
+    self.inserts:Dict[Tuple, List[Dict]] = {}
+    self.updates:Dict[Tuple, List[Dict]] = {}
+    self.deletes:Dict[Tuple, List[str]] = {}
+    # by (start label, type, end label): rows to create, relationships ids to delete
+    self.connects:Dict[Tuple, List[Dict]] = {}
+    self.disconnects:Dict[Tuple, List[int]] = {}
+    # by collection: documents to insert or replace, ids to delete
+    self.documents:Dict[str, List[Dict]] = {}
+    self.changed_documents:Dict[str, int] = {}
+    self.removed_documents:Dict[str, List[ObjectId]] = {}
+
+  def summary(self) -> List[str]:
+    """function to describe the delta, one line by label, relationship and collection
+
+    Returns:
+        List[str]: the lines of the summary
+    """
+    lines = []
+    # counts by label (first label of the node class)
+    counts:Dict[str, List[int]] = {}
+    for index, changes in enumerate([self.inserts, self.updates, self.deletes]):
+      for key, rows in changes.items():
+        counts.setdefault(key[0][0], [0, 0, 0])[index] += len(rows)
+    for label in sorted(counts.keys()):
+      inserts, updates, deletes = counts[label]
+      if inserts or updates or deletes:
+        lines.append(f'  {label}: +{inserts} ~{updates} -{deletes}')
+    for key in sorted(set(self.connects) | set(self.disconnects)):
+      connects, disconnects = len(self.connects.get(key, [])), len(self.disconnects.get(key, []))
+      if connects or disconnects:
+        lines.append(f'  ({key[0]})-[{key[1]}]->({key[2]}): +{connects} -{disconnects}')
+    for collection in sorted(set(self.documents) | set(self.removed_documents)):
+      changed = self.changed_documents.get(collection, 0)
+      inserts = len(self.documents.get(collection, [])) - changed
+      removed = len(self.removed_documents.get(collection, []))
+      if inserts or changed or removed:
+        lines.append(f'  mongo {collection}: +{inserts} ~{changed} -{removed}')
+    return lines
+
+class DeltaBackend(Backend):
+  """Backend synchronizing the live databases with the build, writing only the changes
+
+  the nodes, relationships and documents of the save are collected, on close:
+    - the uids and properties of the built labels and relationships are read in neo4j
+      (one query by label and by relationship) and compared by hash with the build
+    - the documents of the built collections are read in mongodb and compared by hash
+    - the summary of the delta is printed, then the inserts, updates and deletes are applied
+  the save must contain all the data: what is not built is deleted.
+  the changes are applied by batches, an interrupted sync is completed by running it again.
+  the nodes are identified by their uid only, the databases holding versioned builds
+  (nodes with a build property, builds registry) are refused.
+  """
+  def __init__(self, mongo_config:Dict, batch_size:int=1000, dry_run:bool=False):
+    self.__mongo_host = mongo_config['host']
+    self.__mongo_port = mongo_config['port']
+    self.__mongo_database = mongo_config['database']
+    self.__batch_size = batch_size
+    self.__dry_run = dry_run
+    self.__graph = GraphBuffer()
+    self.__documents:Dict[str, List[Dict]] = {}
+    self.__lock = Lock()
+
+  def save_node(self, node:StructuredNode):
+    self.__graph.add_node(node)
+
+  def connect(self,
+              node:StructuredNode,
+              relationship:str,
+              end_node:StructuredNode,
+              properties:Dict=None):
+    self.__graph.add_relationship(node, relationship, end_node, properties)
+
+  def save_documents(self, collection:str, documents:Iterable[Dict], keys:Tuple[str, ...]=None) -> List[str]:
+    documents = [{'_id': ObjectId(), **document} for document in documents]
+    with self.__lock:
+      self.__documents.setdefault(collection, []).extend(documents)
+    return [str(document['_id']) for document in documents]
+
+  def __check_unversioned(self):
+    mclient = MongoClient(self.__mongo_host, self.__mongo_port)
+    try:
+      builds = mclient.get_database(self.__mongo_database).get_collection(BUILDS_COLLECTION).count_documents({}, limit=1)
+    finally:
+      mclient.close()
+    if builds or versioned_labels():
+      raise DeltaException(['DELTA'],
+                           DeltaExceptionType.VERSIONED_DATA,
+                           'the databases hold versioned builds (--build), the delta compares the nodes by uid only '
+                           'and would modify all the builds, write a new build instead')
+
+  def create_schema(self):
+    # before the unversioned schema, refused by the versioned constraints
+    self.__check_unversioned()
+    bootstrap_schema()
+
+  def __batches(self, rows:List) -> List[List]:
+    return [rows[start:start + self.__batch_size] for start in range(0, len(rows), self.__batch_size)]
+
+  def __nodes_delta(self, delta:GraphDelta) -> Dict[str, List[str]]:
+    # the nodes of a class are in several groups when some have no value for a point property
+    groups:Dict[Tuple, List[Tuple]] = {}
+    for key in self.__graph.nodes.keys():
+      groups.setdefault(key[0], []).append(key)
+
+    labels_by_label = {}
+    for labels, keys in groups.items():
+      labels = list(labels)
+      labels_by_label[labels[0]] = labels
+
+      results, _ = db.cypher_query(f'MATCH (n:{escape(labels[0])}) WHERE {EXACT_LABELS} '
+                                   'RETURN n.uid, properties(n)',
+                                   {'labels': labels})
+      current = dict([(uid, property_hash(properties)) for uid, properties in results])
+
+      built = set()
+      for key in keys:
+        for row in self.__graph.nodes[key]:
+          uid = row['properties'].get('uid')
+          built.add(uid)
+          if uid not in current:
+            delta.inserts.setdefault(key, []).append(row)
+          elif current[uid] != property_hash({**row['properties'], **row['points']}):
+            delta.updates.setdefault(key, []).append(row)
+      delta.deletes[(tuple(labels), ())] = sorted([uid for uid in current if uid not in built])
+
+    return labels_by_label
+
+  def __relationships_delta(self, delta:GraphDelta, labels_by_label:Dict[str, List[str]]):
+    for key, rows in self.__graph.relationships.items():
+      start_label, rel_type, end_label = key
+      results, _ = db.cypher_query(f'MATCH (a:{escape(start_label)})-[r:{escape(rel_type)}]->(b:{escape(end_label)}) '
+                                   'WHERE all(label IN labels(a) WHERE label IN $start_labels) '
+                                   'AND all(label IN labels(b) WHERE label IN $end_labels) '
+                                   'RETURN a.uid, b.uid, properties(r), id(r)',
+                                   {'start_labels': labels_by_label.get(start_label, [start_label]),
+                                    'end_labels': labels_by_label.get(end_label, [end_label])})
+
+      # the same relationship can be written several times between two nodes
+      current:Dict[Tuple, List[int]] = {}
+      for start, end, properties, rel_id in results:
+        current.setdefault((start, end, property_hash(properties)), []).append(rel_id)
+
+      built = Counter()
+      for row in rows:
+        rel_key = (row['start'], row['end'], property_hash(row['properties']))
+        built[rel_key] += 1
+        if built[rel_key] > len(current.get(rel_key, [])):
+          delta.connects.setdefault(key, []).append(row)
+
+      delta.disconnects[key] = sorted([rel_id for rel_key, rel_ids in current.items()\
+                                       for rel_id in rel_ids[built[rel_key]:]])
+
+  def __documents_delta(self, delta:GraphDelta, database):
+    for collection, documents in self.__documents.items():
+      current = dict([(document['_id'], document_hash(document))\
+                      for document in database.get_collection(collection).find()])
+
+      ids = set()
+      for document in documents:
+        ids.add(document['_id'])
+        if document['_id'] not in current:
+          delta.documents.setdefault(collection, []).append(document)
+        elif current[document['_id']] != document_hash(document):
+          delta.documents.setdefault(collection, []).append(document)
+          delta.changed_documents[collection] = delta.changed_documents.get(collection, 0) + 1
+      delta.removed_documents[collection] = [document_id for document_id in current if document_id not in ids]
+
+  def __apply(self, delta:GraphDelta, database):
+    for key, rel_ids in delta.disconnects.items():
+      for batch in self.__batches(rel_ids):
+        db.cypher_query('UNWIND $ids AS rel_id MATCH ()-[r]->() WHERE id(r) = rel_id DELETE r', {'ids': batch})
+
+    for key, uids in delta.deletes.items():
+      labels = list(key[0])
+      for batch in self.__batches(uids):
+        db.cypher_query(f'UNWIND $uids AS uid MATCH (n:{escape(labels[0])} {{uid: uid}}) '
+                        f'WHERE {EXACT_LABELS} DETACH DELETE n',
+                        {'uids': batch, 'labels': labels})
+
+    for (labels, points), rows in delta.inserts.items():
+      statement = create_nodes_statement(labels, points)
+      for batch in self.__batches(rows):
+        db.cypher_query(statement, {'rows': batch})
+
+    for (labels, points), rows in delta.updates.items():
+      # the point properties are set after the others (SET n = removes them)
+      statement = '\n'.join(['UNWIND $rows AS row',
+                             f'MATCH (n:{escape(labels[0])} {{uid: row.properties.uid}})',
+                             f'WHERE {EXACT_LABELS}',
+                             'SET n = row.properties']\
+                            + [f'SET n.{escape(point)} = point(row.points.{escape(point)})' for point in points])
+      for batch in self.__batches(rows):
+        db.cypher_query(statement, {'rows': batch, 'labels': list(labels)})
+
+    for key, rows in delta.connects.items():
+      statement = create_relationships_statement(*key)
+      for batch in self.__batches(rows):
+        db.cypher_query(statement, {'rows': batch})
+
+    for collection in set(delta.documents) | set(delta.removed_documents):
+      mcollection = database.get_collection(collection)
+      documents = delta.documents.get(collection, [])
+      removed = delta.removed_documents.get(collection, [])
+      requests = [DeleteMany({'_id': {'$in': batch}}) for batch in self.__batches(removed)]\
+                 + [ReplaceOne({'_id': document['_id']}, document, upsert=True) for document in documents]
+      for batch in self.__batches(requests):
+        mcollection.bulk_write(batch, ordered=False)
+
+  def close(self):
+    mclient = MongoClient(self.__mongo_host, self.__mongo_port)
+    database = mclient.get_database(self.__mongo_database)
+
+    print('compute the delta with the databases')
+    delta = GraphDelta()
+    labels_by_label = self.__nodes_delta(delta)
+    self.__relationships_delta(delta, labels_by_label)
+    self.__documents_delta(delta, database)
+
+    summary = delta.summary()
+    print(f'delta (+ inserts, ~ updates, - deletes), {len(summary)} labels, relationships and collections changed:')
+    print('\n'.join(summary) if summary else '  no change')
+
+    if self.__dry_run:
+      print('dry run, the delta is not applied')
+    elif summary:
+      print('apply the delta')
+      self.__apply(delta, database)
+    mclient.close()
@@ -0,0 +1,228 @@
+import glob
+import gzip
+import json
+import os
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+import bson
+from bson import ObjectId, json_util
+from neomodel.core import StructuredNode
+from persistence.backend import Backend, keys_index
+from persistence.graph import GraphBuffer
+from persistence.schema import document_indexes
+
+GRAPH_DIR = 'graph'
+DOCUMENTS_DIR = 'mongo'
+DUMP_DIR = 'dump'
+RESTORE_SCRIPT = 'restore.sh'
+# ndjson : mongoimport files, bson : mongodump directory (mongorestore), bson.gz : gzipped mongodump directory
+DOCUMENTS_FORMATS = ['ndjson', 'bson', 'bson.gz']
+# mongorestore insertion workers by collection
+RESTORE_WORKERS = 4
+
+class ExportBackend(Backend):
+  """Backend writing the data in a bundle directory instead of the databases
+
+  the bundle contains:
+    - graph/NNNNN.cypher : batched UNWIND statements, nodes first then relationships
+    - graph/NNNNN.json : the parameters ($rows) of the statement with the same number
+    - mongo/<collection>.ndjson : the documents, in mongodb extended json (mongoimport format)
+    - or with the bson documents format, dump/<database>/<collection>.bson : the documents
+      as a mongodump directory, loaded by mongorestore (dump/restore.sh)
+  the ids of the documents without id are generated on the client side.
+  """
+  def __init__(self,
+               directory:str,
+               batch_size:int=1000,
+               documents_format:str='ndjson',
+               database:str=None):
+    self.__directory = directory
+    self.__batch_size = batch_size
+    self.__documents_format = documents_format
+    self.__database = database
+    self.__graph = GraphBuffer()
+    self.__documents:Dict[str, List[Dict]] = {}
+    self.__keys:Dict[str, Tuple[str, ...]] = {}
+    self.__lock = Lock()
+
+  def save_node(self, node:StructuredNode):
+    self.__graph.add_node(node)
+
+  def connect(self,
+              node:StructuredNode,
+              relationship:str,
+              end_node:StructuredNode,
+              properties:Dict=None):
+    self.__graph.add_relationship(node, relationship, end_node, properties)
+
+  def save_documents(self, collection:str, documents:Iterable[Dict], keys:Tuple[str, ...]=None) -> List[str]:
+    # the documents without id get one generated on the client side
+    documents = [{'_id': ObjectId(), **document} for document in documents]
+    with self.__lock:
+      self.__documents.setdefault(collection, []).extend(documents)
+      if keys:
+        self.__keys[collection] = keys
+    return [str(document['_id']) for document in documents]
+
+  @staticmethod
+  def __reset_directory(directory:str, patterns:List[str]):
+    os.makedirs(directory, exist_ok=True)
+    for pattern in patterns:
+      for file in glob.glob(os.path.join(directory, pattern)):
+        os.remove(file)
+
+  def close(self):
+    graph_dir = os.path.join(self.__directory, GRAPH_DIR)
+    documents_dir = os.path.join(self.__directory, DOCUMENTS_DIR)
+    self.__reset_directory(graph_dir, ['*.cypher', '*.json'])
+
+    print(f'write graph bundle in {graph_dir}')
+    index = 0
+    for batches in [self.__graph.node_batches(self.__batch_size),
+                    self.__graph.relationship_batches(self.__batch_size)]:
+      for statement, rows in batches:
+        index += 1
+        with open(os.path.join(graph_dir, f'{index:05d}.cypher'), 'w') as f:
+          f.write(statement + ';\n')
+        with open(os.path.join(graph_dir, f'{index:05d}.json'), 'w') as f:
+          json.dump({'rows': rows}, f, sort_keys=True, default=str)
+
+    if self.__documents_format == 'ndjson':
+      write_documents(documents_dir, self.__documents)
+    else:
+      write_dump(os.path.join(self.__directory, DUMP_DIR),
+                 self.__database,
+                 self.__documents,
+                 self.__keys,
+                 compress=self.__documents_format == 'bson.gz')
+
+def write_documents(documents_dir:str, documents:Dict[str, List[Dict]]):
+  """function to write documents as ndjson files, one by collection
+
+  Args:
+      documents_dir (str): directory to write, the previous files are removed
+      documents (Dict[str, List[Dict]]): documents by collection name
+  """
+  os.makedirs(documents_dir, exist_ok=True)
+  for file in glob.glob(os.path.join(documents_dir, '*.ndjson')):
+    os.remove(file)
+
+  print(f'write documents bundle in {documents_dir}')
+  for collection, collection_documents in documents.items():
+    with open(os.path.join(documents_dir, f'{collection}.ndjson'), 'w') as f:
+      for document in collection_documents:
+        f.write(json_util.dumps(document) + '\n')
+
+def write_dump(dump_dir:str,
+               database:str,
+               documents:Dict[str, List[Dict]],
+               keys:Dict[str, Tuple[str, ...]]=None,
+               compress:bool=False):
+  """function to write documents as a mongodump directory, loaded by mongorestore
+  (from another network, faster than the python inserts with several insertion workers)
+    - <database>/<collection>.bson : the documents, with their _id
+    - <database>/<collection>.metadata.json : the indexes of the collection
+    - restore.sh : the mongorestore command loading the directory
+  with compress, the files are gzipped (mongorestore --gzip)
+
+  Args:
+      dump_dir (str): directory to write, the previous files are removed
+      database (str): name of the database
+      documents (Dict[str, List[Dict]]): documents by collection name
+      keys (Dict[str, Tuple[str, ...]], optional): natural key of the documents by collection name,
+                                                   restored as a unique index. Defaults to None.
+      compress (bool, optional): gzip the files. Defaults to False.
+  """
+  keys = keys or {}
+  database_dir = os.path.join(dump_dir, database)
+  os.makedirs(database_dir, exist_ok=True)
+  for pattern in ['*.bson', '*.bson.gz', '*.metadata.json', '*.metadata.json.gz']:
+    for file in glob.glob(os.path.join(database_dir, pattern)):
+      os.remove(file)
+
+  extension = '.gz' if compress else ''
+  open_file = gzip.open if compress else open
+
+  print(f'write documents dump in {database_dir}')
+  for collection, collection_documents in documents.items():
+    # concatenated bson documents
+    with open_file(os.path.join(database_dir, f'{collection}.bson{extension}'), 'wb') as f:
+      for document in collection_documents:
+        f.write(bson.encode(document))
+
+    indexes = [{'key': {'_id': 1}, 'name': '_id_'}] + document_indexes(collection)
+    if collection in keys and keys_index(keys[collection])['name'] not in [index['name'] for index in indexes]:
+      indexes.append(keys_index(keys[collection]))
+    indexes = [{'v': 2, **index} for index in indexes]
+    metadata = {'options': {},
+                'indexes': indexes,
+                'collectionName': collection,
+                'type': 'collection'}
+    with open_file(os.path.join(database_dir, f'{collection}.metadata.json{extension}'), 'wb') as f:
+      f.write(json_util.dumps(metadata).encode())
+
+  script = ['#!/bin/sh',
+            '# usage: ./restore.sh [uri] [insertion workers] (default mongodb://localhost:27017 and '
+            f'{RESTORE_WORKERS})',
+            '# the collections are replaced (--drop)',
+            'cd "$(dirname "$0")"',
+            'mongorestore --drop \\']\
+           + (['  --gzip \\'] if compress else [])\
+           + [f'  --numInsertionWorkersPerCollection="${{2:-{RESTORE_WORKERS}}}" \\',
+              '  --uri="${1:-mongodb://localhost:27017}" \\',
+              '  --dir=.']
+  with open(os.path.join(dump_dir, RESTORE_SCRIPT), 'w') as f:
+    f.write('\n'.join(script) + '\n')
+
+def read_dump(dump_dir:str) -> Dict[str, Dict[str, List[Dict]]]:
+  """function to read the documents of a mongodump directory written by write_dump
+
+  Args:
+      dump_dir (str): dump directory
+
+  Returns:
+      Dict[str, Dict[str, List[Dict]]]: documents by database and collection name
+  """
+  dump = {}
+  for documents_file in sorted(glob.glob(os.path.join(dump_dir, '*', '*.bson*'))):
+    database = os.path.basename(os.path.dirname(documents_file))
+    collection, extension = os.path.basename(documents_file).split('.bson')
+    open_file = gzip.open if extension == '.gz' else open
+    with open_file(documents_file, 'rb') as f:
+      dump.setdefault(database, {})[collection] = list(bson.decode_file_iter(f))
+  return dump
+
+def load_bundle(directory:str, mongo_config:Dict):
+  """function to load a bundle written by an ExportBackend in neo4j and mongodb
+
+  Args:
+      directory (str): bundle directory
+      mongo_config (Dict): mongodb configuration (host, port, database)
+  """
+  from neomodel import db
+  from pymongo import MongoClient
+  from persistence.schema import bootstrap_schema
+
+  bootstrap_schema()
+  print('load graph bundle')
+  for statement_file in sorted(glob.glob(os.path.join(directory, GRAPH_DIR, '*.cypher'))):
+    with open(statement_file, 'r') as f:
+      statement = f.read().rstrip().rstrip(';')
+    with open(statement_file[:-len('.cypher')] + '.json', 'r') as f:
+      parameters = json.load(f)
+    db.cypher_query(statement, parameters)
+
+  print('load documents bundle')
+  mclient = MongoClient(mongo_config['host'], mongo_config['port'])
+  database = mclient.get_database(mongo_config['database'])
+  for documents_file in sorted(glob.glob(os.path.join(directory, DOCUMENTS_DIR, '*.ndjson'))):
+    collection = os.path.basename(documents_file)[:-len('.ndjson')]
+    with open(documents_file, 'r') as f:
+      documents = [json_util.loads(line) for line in f if line.strip()]
+    if documents:
+      database.get_collection(collection).insert_many(documents)
+  # documents written as a mongodump directory, restored in the configured database
+  for collections in read_dump(os.path.join(directory, DUMP_DIR)).values():
+    for collection, documents in collections.items():
+      if documents:
+        database.get_collection(collection).insert_many(documents)
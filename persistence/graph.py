@@ -0,0 +1,230 @@
+import json
+from threading import Lock
+from typing import Dict, Iterator, List, Tuple
+from neomodel.core import StructuredNode
+from neomodel.contrib.spatial_properties import PointProperty
+from neomodel.relationship_manager import INCOMING
+
+def plain_value(value):
+  """function to convert numpy scalars (and lists of) to python values
+
+  Args:
+      value : the value to convert
+
+  Returns:
+      the python value
+  """
+  if isinstance(value, (list, tuple)):
+    return [plain_value(v) for v in value]
+  if hasattr(value, 'item'):
+    return value.item()
+  return value
+
+def node_properties(node:StructuredNode) -> Tuple[Dict, Dict]:
+  """function to get the properties of a node under the format written in neo4j
+
+  Args:
+      node (StructuredNode): the node
+
+  Returns:
+      Tuple[Dict, Dict]: the properties and the point properties (as x,y,z,crs dict)
+  """
+  properties = {}
+  points = {}
+  for name, prop in node.__class__.defined_properties(aliases=False, rels=False).items():
+    value = getattr(node, name)
+    if value is None:
+      continue
+    if isinstance(prop, PointProperty):
+      point = {'x': value.x, 'y': value.y, 'crs': value.crs}
+      if value.crs.endswith('3d'):
+        point['z'] = value.z
+      points[name] = plain_value(point)
+    else:
+      properties[name] = plain_value(prop.deflate(value))
+
+  return properties, points
+
+def relationship_type(node:StructuredNode, relationship:str) -> Tuple[str, bool]:
+  """function to get the type of a relationship defined in a node class
+
+  Args:
+      node (StructuredNode): the node owning the relationship definition
+      relationship (str): name of the relationship attribute
+
+  Returns:
+      Tuple[str, bool]: relationship type, True if the relationship goes from the node
+  """
+  definition = getattr(node, relationship).definition
+  return definition['relation_type'], definition['direction'] != INCOMING
+
+def escape(name:str) -> str:
+  return '`' + name.replace('`', '``') + '`'
+
+def create_nodes_statement(labels:List[str],
+                           points:List[str],
+                           return_ids:bool=False,
+                           merge:bool=False,
+                           merge_keys:Tuple[str, ...]=('uid',)) -> str:
+  if return_ids:
+    # the row index is returned with the node id to match them
+    statement = ['UNWIND range(0, size($rows) - 1) AS index',
+                 'WITH index, $rows[index] AS row']
+  else:
+    statement = ['UNWIND $rows AS row']
+  if merge:
+    # the node is matched by its own label (the first one) and its uid (and build),
+    # its properties are replaced by the built ones
+    keys = ', '.join([f'{escape(key)}: row.properties.{escape(key)}' for key in merge_keys])
+    statement += [f'MERGE (n:{escape(labels[0])} {{{keys}}})',
+                  'SET n = row.properties']
+    if len(labels) > 1:
+      statement.append(f"SET n:{':'.join([escape(label) for label in labels[1:]])}")
+  else:
+    statement += [f"CREATE (n:{':'.join([escape(label) for label in labels])})",
+                  'SET n = row.properties']
+  for point in points:
+    statement.append(f'SET n.{escape(point)} = point(row.points.{escape(point)})')
+  if return_ids:
+    statement.append('RETURN index, id(n)')
+  return '\n'.join(statement)
+
+def node_row(node:StructuredNode) -> Tuple[Tuple, Dict]:
+  """function to get the row creating a node and the key of its statement
+
+  Args:
+      node (StructuredNode): the node
+
+  Returns:
+      Tuple[Tuple, Dict]: (labels, point properties names) and the row
+  """
+  properties, points = node_properties(node)
+  key = (tuple(node.inherited_labels()), tuple(sorted(points.keys())))
+  return key, {'properties': properties, 'points': points}
+
+# properties identifying a relationship among the relationships of the same type between two nodes
+# (assemble: index in the stack, preconditions and results: relation and state),
+# the other properties of a merged relationship are updated in place
+RELATIONSHIP_KEYS = ('stackIndex', 'relation', 'state')
+
+def relationship_keys(properties:Dict) -> Tuple[str, ...]:
+  # the identifying properties of a relationship, none for a single relationship between two nodes
+  return tuple([key for key in RELATIONSHIP_KEYS if properties.get(key) is not None])
+
+def create_relationships_statement(start_label:str,
+                                   rel_type:str,
+                                   end_label:str,
+                                   merge:bool=False,
+                                   merge_keys:Tuple[str, ...]=(),
+                                   versioned:bool=False,
+                                   return_count:bool=False) -> str:
+  """function to get the statement creating relationships between nodes matched by label and uid
+  (rows {start: uid, end: uid, properties: {...}}), the database ids of the nodes are not used
+
+  Args:
+      start_label (str): label of the start nodes
+      rel_type (str): relationship type
+      end_label (str): label of the end nodes
+      merge (bool, optional): merge the relationships instead of creating them. Defaults to False.
+      merge_keys (Tuple[str, ...], optional): identifying properties of a merged relationship. Defaults to ().
+      versioned (bool, optional): the nodes are matched in the build $build. Defaults to False.
+      return_count (bool, optional): return the number of relationships written. Defaults to False.
+
+  Returns:
+      str: the statement
+  """
+  # a merged relationship is unique by type and identifying properties (merge_keys) between two nodes,
+  # its properties are replaced
+  build = ', build: $build' if versioned else ''
+  merge_properties = ', '.join([f'{escape(key)}: row.properties.{escape(key)}' for key in merge_keys])
+  pattern = f'[r:{escape(rel_type)} {{{merge_properties}}}]' if merge_keys else f'[r:{escape(rel_type)}]'
+  return '\n'.join(['UNWIND $rows AS row',
+                    f'MATCH (a:{escape(start_label)} {{uid: row.start{build}}})',
+                    f'MATCH (b:{escape(end_label)} {{uid: row.end{build}}})',
+                    f"{'MERGE' if merge else 'CREATE'} (a)-{pattern}->(b)",
+                    'SET r = row.properties']\
+                   + (['RETURN count(r)'] if return_count else []))
+
+def relationship_properties(properties:Dict) -> Dict:
+  return dict([(name, plain_value(value))\
+               for name, value in (properties or {}).items()])
+
+class GraphBuffer:
+  """Class used to collect the nodes and relationships of a graph
+  grouped by labels and relationship types, to write them by batches
+
+  the nodes are identified by their label and uid.
+  """
+  def __init__(self):
+    self.__nodes:Dict[Tuple, List[Dict]] = {}
+    self.__relationships:Dict[Tuple, List[Dict]] = {}
+    # the save stages run in several threads
+    self.__lock = Lock()
+
+  def add_node(self, node:StructuredNode):
+    key, row = node_row(node)
+    with self.__lock:
+      self.__nodes.setdefault(key, []).append(row)
+
+  def add_relationship(self,
+                       node:StructuredNode,
+                       relationship:str,
+                       end_node:StructuredNode,
+                       properties:Dict=None):
+    rel_type, outgoing = relationship_type(node, relationship)
+    start, end = (node, end_node) if outgoing else (end_node, node)
+
+    key = (start.__label__, rel_type, end.__label__)
+    row = {'start': start.uid,
+           'end': end.uid,
+           'properties': relationship_properties(properties)}
+    with self.__lock:
+      self.__relationships.setdefault(key, []).append(row)
+
+  @property
+  def nodes(self) -> Dict[Tuple, List[Dict]]:
+    # rows by (labels, point properties names)
+    return self.__nodes
+
+  @property
+  def relationships(self) -> Dict[Tuple, List[Dict]]:
+    # rows by (start label, relationship type, end label)
+    return self.__relationships
+
+  @staticmethod
+  def __batches(rows:List[Dict], batch_size:int) -> Iterator[List[Dict]]:
+    for index in range(0, len(rows), batch_size):
+      yield rows[index:index+batch_size]
+
+  def node_batches(self, batch_size:int) -> Iterator[Tuple[str, List[Dict]]]:
+    """function to get the statements creating the nodes, in a stable order
+
+    Args:
+        batch_size (int): max number of rows by statement
+
+    Yields:
+        Iterator[Tuple[str, List[Dict]]]: statement and its rows parameter
+    """
+    for key in sorted(self.__nodes.keys()):
+      labels, points = key
+      statement = create_nodes_statement(labels, points)
+      rows = sorted(self.__nodes[key], key=lambda row: str(row['properties'].get('uid')))
+      for batch in self.__batches(rows, batch_size):
+        yield statement, batch
+
+  def relationship_batches(self, batch_size:int) -> Iterator[Tuple[str, List[Dict]]]:
+    """function to get the statements creating the relationships, in a stable order
+
+    Args:
+        batch_size (int): max number of rows by statement
+
+    Yields:
+        Iterator[Tuple[str, List[Dict]]]: statement and its rows parameter
+    """
+    for key in sorted(self.__relationships.keys()):
+      statement = create_relationships_statement(*key)
+      rows = sorted(self.__relationships[key],
+                    key=lambda row: (row['start'], row['end'],
+                                     json.dumps(row['properties'], sort_keys=True, default=str)))
+      for batch in self.__batches(rows, batch_size):
+        yield statement, batch
@@ -0,0 +1,76 @@
+from time import perf_counter
+from typing import Any, Callable, ContextManager, Dict, Hashable, Iterable, List, Tuple
+from neomodel.core import StructuredNode
+from persistence.backend import Backend, Relationship
+from report import RunReport
+
+class InstrumentedBackend(Backend):
+  """Backend measuring the calls of another backend
+  the number of written elements and the time spent are recorded in a run report
+  under the stage running the call
+  """
+  def __init__(self, backend:Backend, report:RunReport):
+    self.__backend = backend
+    self.__report = report
+
+  @property
+  def backend(self):
+    return self.__backend
+
+  def write_batches(self,
+                    name:str,
+                    definitions:Iterable[Any],
+                    write:Callable[[List[Any]], None],
+                    partition:Callable[[Any], Hashable]=None,
+                    graph:bool=True):
+    self.__backend.write_batches(name, definitions, write, partition, graph)
+
+  def transaction(self) -> ContextManager:
+    return self.__backend.transaction()
+
+  def create_schema(self):
+    with self.__report.stage('schema'):
+      self.__backend.create_schema()
+
+  @property
+  def transient_errors(self) -> Tuple[type, ...]:
+    return self.__backend.transient_errors
+
+  def restore_nodes(self, nodes:List[StructuredNode]):
+    self.__backend.restore_nodes(nodes)
+
+  def save_node(self, node:StructuredNode):
+    start = perf_counter()
+    self.__backend.save_node(node)
+    self.__report.record_write('nodes', 1, perf_counter() - start)
+
+  def save_nodes(self, nodes:List[StructuredNode]) -> List[int]:
+    start = perf_counter()
+    ids = self.__backend.save_nodes(nodes)
+    self.__report.record_write('nodes', len(nodes), perf_counter() - start)
+    return ids
+
+  def connect(self,
+              node:StructuredNode,
+              relationship:str,
+              end_node:StructuredNode,
+              properties:Dict=None):
+    start = perf_counter()
+    self.__backend.connect(node, relationship, end_node, properties)
+    self.__report.record_write('relationships', 1, perf_counter() - start)
+
+  def connect_nodes(self, relationships:List[Relationship]):
+    start = perf_counter()
+    self.__backend.connect_nodes(relationships)
+    self.__report.record_write('relationships', len(relationships), perf_counter() - start)
+
+  def save_documents(self, collection:str, documents:Iterable[Dict], keys:Tuple[str, ...]=None) -> List[str]:
+    start = perf_counter()
+    ids = self.__backend.save_documents(collection, documents, keys)
+    # the documents can be a generator, they are counted by id
+    self.__report.record_write('documents', len(ids), perf_counter() - start)
+    return ids
+
+  def close(self):
+    with self.__report.stage('close'):
+      self.__backend.close()
@@ -0,0 +1,101 @@
+import json
+import os
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Tuple
+from exceptions import BaseException, ExceptionType
+
+class JournalExceptionType(ExceptionType):
+  BATCH_MISMATCH = "JOURNAL_BATCH_MISMATCH"
+
+class JournalException(BaseException):
+  def __init__(self, origin_stack:List[str], type:JournalExceptionType, description:str):
+    super().__init__(origin_stack,
+                     type,
+                     description)
+
+class WriteJournal:
+  """Class used to record the write batches committed in the databases
+
+  the journal is an append-only json lines file, one line per committed batch:
+  {"stage": ..., "name": ..., "batch": ..., "count": ..., "first_uid": ..., "last_uid": ..., "uids": [...]}
+  a line is written (and flushed to the disk) only once the batch is committed,
+  an interrupted run restarts after the last batch found in the journal.
+  """
+  def __init__(self, journal_file:str):
+    self.__journal_file = journal_file
+    self.__entries:Dict[Tuple[str, str, int], Dict] = {}
+    self.__lock = Lock()
+
+    if os.path.exists(journal_file):
+      with open(journal_file, 'r') as f:
+        for line in f:
+          try:
+            entry = json.loads(line)
+          except json.JSONDecodeError:
+            # last line partially written when the run stopped
+            continue
+          self.__entries[(entry['stage'], entry['name'], entry['batch'])] = entry
+
+  @property
+  def path(self):
+    return self.__journal_file
+
+  def __len__(self):
+    return len(self.__entries)
+
+  def committed(self, stage:str, name:str, batch:int, uids:List[str]) -> Dict:
+    """function to get the journal entry of a committed batch
+
+    Args:
+        stage (str): stage writing the batch
+        name (str): name of the written collection
+        batch (int): batch index in the collection
+        uids (List[str]): uids of the batch elements, in the batch order
+
+    Raises:
+        JournalException: the batch committed does not have the same elements (batch size or data changed)
+
+    Returns:
+        Dict: the journal entry, None if the batch is not committed
+    """
+    entry = self.__entries.get((stage, name, batch))
+    if entry and entry['uids'] != uids:
+      raise JournalException(['JOURNAL', stage, name],
+                             JournalExceptionType.BATCH_MISMATCH,
+                             f"batch {batch} committed with other elements ({entry['first_uid']} to {entry['last_uid']}), the journal {self.__journal_file} does not match the data or the batch size")
+    return entry
+
+  def commit(self, stage:str, name:str, batch:int, uids:List[str]):
+    """function to record a committed batch
+
+    Args:
+        stage (str): stage writing the batch
+        name (str): name of the written collection
+        batch (int): batch index in the collection
+        uids (List[str]): uids of the batch elements, in the batch order
+    """
+    entry = {'stage': stage,
+             'name': name,
+             'batch': batch,
+             'count': len(uids),
+             'first_uid': uids[0] if uids else None,
+             'last_uid': uids[-1] if uids else None,
+             'uids': uids,
+             'committed': datetime.now().isoformat()}
+
+    with self.__lock:
+      directory = os.path.dirname(self.__journal_file)
+      if directory:
+        os.makedirs(directory, exist_ok=True)
+      with open(self.__journal_file, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+      self.__entries[(stage, name, batch)] = entry
+
+  def clear(self):
+    with self.__lock:
+      if os.path.exists(self.__journal_file):
+        os.remove(self.__journal_file)
+      self.__entries = {}
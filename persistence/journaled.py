@@ -0,0 +1,212 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from threading import Lock, local
+from typing import Any, Callable, ContextManager, Dict, Hashable, Iterable, List, Tuple
+from neomodel.core import StructuredNode
+from tqdm import tqdm
+from persistence.backend import Backend, Relationship
+from persistence.journal import WriteJournal
+from report import current_stage, set_current_stage
+
+class JournaledBackend(Backend):
+  """Backend writing the batches of another backend in a write journal
+
+  the definitions are written by batches of batch_size definitions (a node and
+  its relationships), the size can be set by stage (stages_batch_size).
+  each batch is written in a transaction, rolled back on error, and recorded in
+  the journal once committed (the documents batches, graph=False, without graph transaction).
+  the batches already in the journal (interrupted run) are not written again,
+  the nodes database ids are restored to connect them with the nodes of the
+  following batches.
+
+  the definitions of a partitioned write (ex: by rail) are batched by partition,
+  the partitions are written by writers threads at the same time.
+  the relationships to the hub nodes (instances of hub_classes, connected to most
+  of the nodes, and the nodes selected by hub_nodes, ex: a part shared by the rails) are written at the end of the batch transaction, one writer at a
+  time until the commit: the writers never wait for each other on the hub nodes locks.
+  the batches failing on a transient error (ex: deadlock) are written again
+  after an exponential backoff.
+  """
+  def __init__(self,
+               backend:Backend,
+               journal:WriteJournal,
+               batch_size:int=500,
+               stages_batch_size:Dict[str, int]=None,
+               writers:int=1,
+               hub_classes:Tuple[type, ...]=(),
+               hub_nodes:Callable[[StructuredNode], bool]=None,
+               retries:int=5,
+               backoff:float=0.5):
+    self.__backend = backend
+    self.__journal = journal
+    self.__batch_size = batch_size
+    self.__stages_batch_size = stages_batch_size or {}
+    self.__writers = writers
+    self.__hub_classes = hub_classes
+    self.__hub_nodes = hub_nodes
+    self.__retries = retries
+    self.__backoff = backoff
+    self.__hub_lock = Lock()
+    # hub relationships of the batch written by the thread (None if not deferred)
+    self.__local = local()
+
+  @property
+  def backend(self):
+    return self.__backend
+
+  @property
+  def journal(self):
+    return self.__journal
+
+  def __partitions(self,
+                   definitions:List[Any],
+                   partition:Callable[[Any], Hashable],
+                   batch_size:int) -> List[List[Tuple[int, List[Any]]]]:
+    # batches (index, definitions) of each partition, the indexes do not depend on the writers number
+    groups:Dict[Hashable, List[Any]] = {}
+    for definition in definitions:
+      groups.setdefault(partition(definition) if partition else None, []).append(definition)
+
+    partitions = []
+    index = 0
+    for key in sorted(groups.keys(), key=str):
+      group = groups[key]
+      batches = []
+      for start in range(0, len(group), batch_size):
+        batches.append((index, group[start:start + batch_size]))
+        index += 1
+      partitions.append(batches)
+    return partitions
+
+  def __write_batch(self, batch:List[Any], write:Callable[[List[Any]], None], parallel:bool, graph:bool):
+    self.__local.hub_relationships = [] if parallel and graph and (self.__hub_classes or self.__hub_nodes) else None
+    locked = False
+    try:
+      # the documents batches are not written in a graph transaction
+      with self.__backend.transaction() if graph else nullcontext():
+        write(batch)
+        hub_relationships = self.__local.hub_relationships
+        if hub_relationships:
+          # the lock is released once the transaction holding the hub nodes locks is committed
+          self.__hub_lock.acquire()
+          locked = True
+          self.__backend.connect_nodes(hub_relationships)
+    finally:
+      self.__local.hub_relationships = None
+      if locked:
+        self.__hub_lock.release()
+
+  def __write_with_retry(self,
+                         name:str,
+                         index:int,
+                         batch:List[Any],
+                         write:Callable[[List[Any]], None],
+                         parallel:bool,
+                         graph:bool):
+    for attempt in range(self.__retries + 1):
+      try:
+        self.__write_batch(batch, write, parallel, graph)
+        return
+      except self.__backend.transient_errors as error:
+        if attempt == self.__retries:
+          raise
+        delay = self.__backoff * 2 ** attempt * (1 + random.random())
+        print(f'{name} batch {index} : {error.__class__.__name__}, written again in {delay:.1f}s')
+        time.sleep(delay)
+
+  def write_batches(self,
+                    name:str,
+                    definitions:Iterable[Any],
+                    write:Callable[[List[Any]], None],
+                    partition:Callable[[Any], Hashable]=None,
+                    graph:bool=True):
+    definitions = list(definitions)
+    stage = current_stage() or 'unknown'
+    batch_size = self.__stages_batch_size.get(stage, self.__batch_size)
+    partitions = self.__partitions(definitions, partition, batch_size)
+    parallel = self.__writers > 1 and len(partitions) > 1
+    resumed = []
+    progress = tqdm(total=len(definitions))
+
+    def write_partition(batches:List[Tuple[int, List[Any]]]):
+      # the writers report under the save stage
+      set_current_stage(stage)
+      for index, batch in batches:
+        nodes = [definition.node for definition in batch]
+        uids = [node.uid for node in nodes]
+
+        if self.__journal.committed(stage, name, index, uids):
+          # batch committed by a previous run
+          if graph:
+            self.__backend.restore_nodes(nodes)
+          resumed.append(len(batch))
+          progress.update(len(batch))
+          continue
+
+        self.__write_with_retry(name, index, batch, write, parallel, graph)
+        self.__journal.commit(stage, name, index, uids)
+        progress.update(len(batch))
+
+    if parallel:
+      with ThreadPoolExecutor(min(self.__writers, len(partitions))) as executor:
+        for future in [executor.submit(write_partition, batches) for batches in partitions]:
+          future.result()
+    else:
+      for batches in partitions:
+        write_partition(batches)
+
+    progress.close()
+
+    if resumed:
+      print(f'{name} : {sum(resumed)} elements already written by a previous run')
+
+  def transaction(self) -> ContextManager:
+    return self.__backend.transaction()
+
+  def create_schema(self):
+    self.__backend.create_schema()
+
+  @property
+  def transient_errors(self) -> Tuple[type, ...]:
+    return self.__backend.transient_errors
+
+  def restore_nodes(self, nodes:List[StructuredNode]):
+    self.__backend.restore_nodes(nodes)
+
+  def save_node(self, node:StructuredNode):
+    self.__backend.save_node(node)
+
+  def save_nodes(self, nodes:List[StructuredNode]) -> List[int]:
+    return self.__backend.save_nodes(nodes)
+
+  def connect(self,
+              node:StructuredNode,
+              relationship:str,
+              end_node:StructuredNode,
+              properties:Dict=None):
+    if getattr(self.__local, 'hub_relationships', None) is not None:
+      self.connect_nodes([(node, relationship, end_node, properties)])
+    else:
+      self.__backend.connect(node, relationship, end_node, properties)
+
+  def __is_hub(self, node:StructuredNode) -> bool:
+    return isinstance(node, self.__hub_classes) or bool(self.__hub_nodes and self.__hub_nodes(node))
+
+  def connect_nodes(self, relationships:List[Relationship]):
+    hub_relationships = getattr(self.__local, 'hub_relationships', None)
+    if hub_relationships is not None:
+      # the hub relationships are written at the end of the batch
+      hub_relationships.extend([relationship for relationship in relationships\
+                                if self.__is_hub(relationship[2]) or self.__is_hub(relationship[0])])
+      relationships = [relationship for relationship in relationships\
+                       if not (self.__is_hub(relationship[2]) or self.__is_hub(relationship[0]))]
+    if relationships:
+      self.__backend.connect_nodes(relationships)
+
+  def save_documents(self, collection:str, documents:Iterable[Dict], keys:Tuple[str, ...]=None) -> List[str]:
+    return self.__backend.save_documents(collection, documents, keys)
+
+  def close(self):
+    self.__backend.close()
@@ -0,0 +1,215 @@
+from itertools import islice
+from threading import Lock
+from typing import ContextManager, Dict, Iterable, List, Tuple
+from neomodel import db
+from neomodel.core import StructuredNode
+from pymongo import InsertOne, MongoClient, ReplaceOne
+from persistence.backend import Backend, Relationship, keys_index
+from persistence.schema import bootstrap_indexes, bootstrap_schema
+from persistence.versions import versioned_collection
+from persistence.graph import create_nodes_statement, create_relationships_statement,\
+                              escape, node_row, relationship_keys, relationship_properties, relationship_type
+
+class LiveBackend(Backend):
+  """Backend writing directly in neo4j (through neomodel) and in mongodb
+
+  the nodes written together (save_nodes) are grouped by labels and created
+  by UNWIND statements of batch_size rows.
+  the relationships written together (connect_nodes) are grouped by type and
+  created by UNWIND statements matching their nodes by label and uid (the nodes
+  can come from the build cache of a previous run), without the neomodel cardinality checks.
+  in upsert mode, the nodes are merged on their label and uid (properties
+  replaced), the relationships merged on their type and identifying properties between two nodes and
+  the documents with an _id replaced: a save can run again on a database
+  already loaded without duplicating the data.
+  a versioned save (build) writes the build id in a build property of the nodes
+  and the documents in versioned collections (ex: carrier_<build>), the other
+  builds of the databases are not modified.
+  the documents are written by chunks of documents_chunk documents (unordered
+  bulk writes) with a single pooled mongodb client.
+  the documents with a natural key (keys) are upserted on it, in any mode, with a
+  unique index on the key: a save run again replaces its documents and only the
+  changed documents are modified.
+  """
+  def __init__(self,
+               mongo_config:Dict,
+               batch_size:int=1000,
+               upsert:bool=False,
+               build:str=None,
+               documents_chunk:int=1000):
+    self.__mongo_host = mongo_config['host']
+    self.__mongo_port = mongo_config['port']
+    self.__mongo_database = mongo_config['database']
+    self.__batch_size = batch_size
+    self.__upsert = upsert
+    self.__build = build
+    self.__documents_chunk = documents_chunk
+    self.__mclient = None
+    self.__lock = Lock()
+    # collections with their natural key index : (collection, keys)
+    self.__keys_indexes = set()
+
+  @property
+  def upsert(self):
+    return self.__upsert
+
+  @property
+  def build(self):
+    return self.__build
+
+  def save_node(self, node:StructuredNode):
+    if self.__upsert or self.__build:
+      self.save_nodes([node])
+    else:
+      node.save()
+
+  def save_nodes(self, nodes:List[StructuredNode]) -> List[int]:
+    groups:Dict[Tuple, List[Tuple[int, Dict]]] = {}
+    for index, node in enumerate(nodes):
+      key, row = node_row(node)
+      if self.__build:
+        row['properties']['build'] = self.__build
+      groups.setdefault(key, []).append((index, row))
+
+    merge_keys = ('uid', 'build') if self.__build else ('uid',)
+    ids = [None] * len(nodes)
+    for (labels, points), rows in groups.items():
+      statement = create_nodes_statement(labels, points, return_ids=True, merge=self.__upsert, merge_keys=merge_keys)
+      for start in range(0, len(rows), self.__batch_size):
+        batch = rows[start:start + self.__batch_size]
+        results, _ = db.cypher_query(statement, {'rows': [row for _, row in batch]})
+        assert len(results) == len(batch), f"{len(batch) - len(results)} {labels[0]} nodes not written"
+        for row_index, node_id in results:
+          index = batch[row_index][0]
+          # the node is now bound to the database node (neomodel connect)
+          nodes[index].id = node_id
+          ids[index] = node_id
+
+    return ids
+
+  def connect(self,
+              node:StructuredNode,
+              relationship:str,
+              end_node:StructuredNode,
+              properties:Dict=None):
+    if self.__upsert:
+      self.connect_nodes([(node, relationship, end_node, properties)])
+    else:
+      getattr(node, relationship).connect(end_node, properties)
+
+  def connect_nodes(self, relationships:List[Relationship]):
+    types:Dict[Tuple[str, str, str, Tuple[str, ...]], List[Dict]] = {}
+    for relationship in relationships:
+      node, name, end_node = relationship[:3]
+      properties = relationship[3] if len(relationship) > 3 else None
+
+      rel_type, outgoing = relationship_type(node, name)
+      start, end = (node, end_node) if outgoing else (end_node, node)
+
+      properties = relationship_properties(properties)
+      # merged on their identifying properties (ex: two preconditions on a state)
+      merge_keys = relationship_keys(properties) if self.__upsert else ()
+      key = (start.__label__, rel_type, end.__label__, merge_keys)
+      types.setdefault(key, []).append({'start': start.uid,
+                                        'end': end.uid,
+                                        'properties': properties})
+
+    for (start_label, rel_type, end_label, merge_keys), rows in types.items():
+      statement = create_relationships_statement(start_label,
+                                                 rel_type,
+                                                 end_label,
+                                                 merge=self.__upsert,
+                                                 merge_keys=merge_keys,
+                                                 versioned=self.__build is not None,
+                                                 return_count=True)
+      for start in range(0, len(rows), self.__batch_size):
+        batch = rows[start:start + self.__batch_size]
+        results, _ = db.cypher_query(statement, {'rows': batch, 'build': self.__build})
+        # a row whose nodes are not matched writes nothing
+        written = results[0][0]
+        assert written == len(batch),\
+               f"{len(batch) - written} ({start_label})-[{rel_type}]->({end_label}) relationships not written, nodes not found"
+
+  def transaction(self) -> ContextManager:
+    # neomodel transactions are bound to the current thread
+    return db.transaction
+
+  def create_schema(self):
+    bootstrap_schema(versioned=self.__build is not None)
+    bootstrap_indexes(self.__mongo_client().get_database(self.__mongo_database), self.__build)
+
+  @property
+  def transient_errors(self) -> Tuple[type, ...]:
+    # deadlocks and lock timeouts are transient errors
+    from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+    return (TransientError, ServiceUnavailable, SessionExpired)
+
+  def restore_nodes(self, nodes:List[StructuredNode]):
+    labels:Dict[str, List[StructuredNode]] = {}
+    for node in nodes:
+      labels.setdefault(node.__label__, []).append(node)
+
+    for label, label_nodes in labels.items():
+      results, _ = db.cypher_query(f'MATCH (n:{escape(label)}) WHERE n.uid IN $uids '
+                                   'AND ($build IS NULL OR n.build = $build) RETURN n.uid, id(n)',
+                                   {'uids': [node.uid for node in label_nodes], 'build': self.__build})
+      ids = dict(results)
+      for node in label_nodes:
+        if node.uid in ids:
+          node.id = ids[node.uid]
+
+  def __mongo_client(self) -> MongoClient:
+    # a single client (and its connections pool) for all the writes, shared by the threads
+    with self.__lock:
+      if self.__mclient is None:
+        self.__mclient = MongoClient(self.__mongo_host, self.__mongo_port)
+      return self.__mclient
+
+  def __create_keys_index(self, mcollection, keys:Tuple[str, ...]):
+    # once by collection, the documents written before the natural keys (without key) are not indexed
+    with self.__lock:
+      if (mcollection.name, keys) in self.__keys_indexes:
+        return
+      index = keys_index(keys)
+      mcollection.create_index(list(index.pop('key').items()), **index)
+      self.__keys_indexes.add((mcollection.name, keys))
+
+  def save_documents(self, collection:str, documents:Iterable[Dict], keys:Tuple[str, ...]=None) -> List[str]:
+    if self.__build:
+      collection = versioned_collection(collection, self.__build)
+    mcollection = self.__mongo_client().get_database(self.__mongo_database).get_collection(collection)
+    if keys:
+      self.__create_keys_index(mcollection, keys)
+
+    # the documents are read by chunks, each chunk written in an unordered bulk write
+    ids = []
+    documents = iter(documents)
+    while True:
+      chunk = list(islice(documents, self.__documents_chunk))
+      if not chunk:
+        break
+
+      if keys:
+        # the documents with a natural key carry their _id, allocated by the client
+        requests = [ReplaceOne(dict([(key, document[key]) for key in keys]), document, upsert=True)\
+                    for document in chunk]
+      elif self.__upsert:
+        requests = [ReplaceOne({'_id': document['_id']}, document, upsert=True) if '_id' in document\
+                    else InsertOne(document) for document in chunk]
+      else:
+        requests = [InsertOne(document) for document in chunk]
+      res = mcollection.bulk_write(requests, ordered=False)
+
+      if not res.acknowledged :
+        raise Exception("Error during insertion")
+
+      # the id of a document inserted without id is set in the document by the client
+      ids.extend([str(document['_id']) for document in chunk])
+
+    return ids
+
+  def close(self):
+    with self.__lock:
+      if self.__mclient is not None:
+        self.__mclient.close()
+        self.__mclient = None
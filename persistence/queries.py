@@ -0,0 +1,99 @@
+from typing import Dict, List
+from persistence.versions import BuildRegistry
+
+COLLECTION = 'carrier'
+
+# fields read by each consumer, the movements documents carry the positions vectors
+# of all their points, they are read only by the consumers sending them to the robot
+ID_FIELDS = {'_id': 1}
+SUMMARY_FIELDS = {'type': 1, 'key': 1, 'assembly': 1, 'description': 1}
+# fields of model.action.Action.parse
+ACTION_FIELDS = {'type': 1, 'description': 1, 'definition': 1}
+
+STATION_TYPE = 'MOVE.STATION.WORK'
+
+class ActionQueries:
+  """Class used to read the action documents with the indexes of the collection
+  (type and key, assembly) and only the fields needed by the consumer (projections)
+
+  the queries of the sequencer read the collection of the current build
+  (ActionQueries.current) or a named collection.
+  """
+  def __init__(self, mongo_config:Dict, collection:str=COLLECTION):
+    from pymongo import MongoClient
+    self.__mclient = MongoClient(mongo_config['host'], mongo_config['port'])
+    self.__collection = self.__mclient.get_database(mongo_config['database'])\
+                                      .get_collection(collection)
+
+  @classmethod
+  def current(cls, mongo_config:Dict) -> 'ActionQueries':
+    """function to get the queries of the actions of the build read by the sequencer
+    (the actions collection of the current build, the unversioned collection without build)
+
+    Args:
+        mongo_config (Dict): mongodb configuration (host, port, database)
+
+    Returns:
+        ActionQueries: the queries on the collection
+    """
+    registry = BuildRegistry(mongo_config)
+    try:
+      pointer = registry.current() or {}
+    finally:
+      registry.close()
+    return cls(mongo_config, pointer.get('collections', {}).get(COLLECTION, COLLECTION))
+
+  @property
+  def collection(self):
+    return self.__collection
+
+  def by_id(self, action_id:str, fields:Dict=ACTION_FIELDS) -> Dict:
+    from bson import ObjectId
+    return self.__collection.find_one({'_id': ObjectId(action_id)}, fields)
+
+  def by_type(self, action_type:str, fields:Dict=SUMMARY_FIELDS) -> List[Dict]:
+    """function to get the actions of a type (ex: WORK.DRILL)
+
+    Args:
+        action_type (str): action type
+        fields (Dict, optional): projection of the documents. Defaults to SUMMARY_FIELDS.
+
+    Returns:
+        List[Dict]: the actions documents
+    """
+    return list(self.__collection.find({'type': action_type}, fields))
+
+  def ids_by_type(self, action_type:str) -> List[str]:
+    # only the ids are sent back
+    return [str(document['_id']) for document in self.__collection.find({'type': action_type}, ID_FIELDS)]
+
+  def by_assembly(self, assembly:str, action_types:List[str]=None, fields:Dict=SUMMARY_FIELDS) -> List[Dict]:
+    """function to get the actions of an assembly (work movement, probing and drilling)
+
+    Args:
+        assembly (str): uid of the assembly
+        action_types (List[str], optional): types of the actions, all the types if None. Defaults to None.
+        fields (Dict, optional): projection of the documents. Defaults to SUMMARY_FIELDS.
+
+    Returns:
+        List[Dict]: the actions documents
+    """
+    query = {'assembly': assembly}
+    if action_types:
+      query['type'] = {'$in': action_types}
+    return list(self.__collection.find(query, fields))
+
+  def station(self, station:str, fields:Dict=ACTION_FIELDS) -> Dict:
+    """function to get the station movement of a station key (ex: web_y+254_front_left)
+
+    Args:
+        station (str): station key
+        fields (Dict, optional): projection of the document. Defaults to ACTION_FIELDS.
+
+    Returns:
+        Dict: the movement document, None if the station does not exist
+    """
+    return self.__collection.find_one({'type': STATION_TYPE, 'key': station}, fields)
+
+  def close(self):
+    self.__mclient.close()
@@ -0,0 +1,223 @@
+import re
+import time
+from importlib import import_module
+from typing import Dict, List, Tuple
+from exceptions import BaseException, ExceptionType
+from persistence.backend import keys_index
+from persistence.graph import escape
+from persistence.versions import versioned_collection
+
+# node classes written by the save stages, their uid is unique in their label
+NODE_CLASSES = [
+  ('neo4mars.process.area', 'Area'),
+  ('neo4mars.product.part', 'Class'),
+  ('neo4mars.product.part', 'Instance'),
+  ('neo4mars.product.fastener', 'Class'),
+  ('neo4mars.product.fastener', 'Instance'),
+  ('neo4mars.product.assembly', 'Assembly'),
+  ('neo4mars.process.operation', 'Class'),
+  ('neo4mars.process.operation', 'Instance'),
+  ('neo4mars.resource.situation', 'StateObject'),
+  ('neo4mars.resource.asset', 'Carrier'),
+  ('neo4mars.resource.asset', 'EndEffector'),
+  ('neo4mars.resource.action', 'Action')
+]
+
+# properties queried by value : (module, class, property)
+RANGE_INDEXES = [
+  ('neo4mars.resource.action', 'Action', 'type'),
+  ('neo4mars.process.operation', 'Class', 'type'),
+  ('neo4mars.process.operation', 'Instance', 'type')
+]
+
+# point properties queried by distance or bounding box : (module, class, property)
+POINT_INDEXES = [
+  ('neo4mars.product.assembly', 'Assembly', 'origin')
+]
+
+# indexes of the documents collections : (collection, fields, unique)
+# the natural key of the actions (type, key) is also the index of the station movements
+# by station key (ex: MOVE.STATION.WORK, web_y+254_front_left).
+# the indexes are partial, a query uses an index only if it filters on all its fields,
+# the queries by type (ex: {type: 'WORK.DRILL'}) have their own index
+DOCUMENT_INDEXES = [
+  ('carrier', ('type', 'key'), True),
+  ('carrier', ('type',), False),
+  ('carrier', ('assembly', 'type'), False)
+]
+
+# seconds to wait for the indexes population
+ONLINE_TIMEOUT = 300
+
+class SchemaExceptionType(ExceptionType):
+  INDEX_FAILED = "SCHEMA_INDEX_FAILED"
+  INDEX_TIMEOUT = "SCHEMA_INDEX_TIMEOUT"
+  VERSIONED_DATA = "SCHEMA_VERSIONED_DATA"
+
+class SchemaException(BaseException):
+  def __init__(self, origin_stack:List[str], type:SchemaExceptionType, description:str):
+    super().__init__(origin_stack,
+                     type,
+                     description)
+
+def node_label(module:str, class_name:str) -> str:
+  return getattr(import_module(module), class_name).__label__
+
+def schema_name(kind:str, label:str, name:str) -> str:
+  return re.sub(r'\W', '_', f'mars_{label}_{name}_{kind}').lower()
+
+def node_labels() -> List[str]:
+  # labels of the node classes written by the save stages
+  return list(dict.fromkeys([node_label(module, class_name) for module, class_name in NODE_CLASSES]))
+
+def versioned_labels() -> List[str]:
+  """function to get the labels holding nodes of a versioned build (with a build property)
+
+  Returns:
+      List[str]: the labels of the versioned nodes
+  """
+  from neomodel import db
+  return [label for label in node_labels()\
+          if db.cypher_query(f'MATCH (n:{escape(label)}) WHERE n.build IS NOT NULL RETURN n.uid LIMIT 1')[0]]
+
+def schema_statements(versioned:bool=False) -> List[Tuple[Tuple[str, Tuple[str, ...]], str]]:
+  """function to get the statements creating the constraints and indexes of the mars graph
+  (they do nothing if an equivalent constraint or index exists)
+
+  Args:
+      versioned (bool, optional): the graph holds several builds, the uid is unique by build. Defaults to False.
+
+  Returns:
+      List[Tuple[Tuple[str, Tuple[str, ...]], str]]: indexed (label, properties) and statement of each constraint and index
+  """
+  statements = []
+  for label in node_labels():
+    if versioned:
+      statements.append(((label, ('uid', 'build')), f'CREATE CONSTRAINT {schema_name("unique", label, "uid_build")} IF NOT EXISTS '
+                                                    f'FOR (n:{escape(label)}) REQUIRE (n.uid, n.build) IS UNIQUE'))
+      # builds deleted by the garbage collection
+      statements.append(((label, ('build',)), f'CREATE INDEX {schema_name("index", label, "build")} IF NOT EXISTS '
+                                              f'FOR (n:{escape(label)}) ON (n.build)'))
+    else:
+      statements.append(((label, ('uid',)), f'CREATE CONSTRAINT {schema_name("unique", label, "uid")} IF NOT EXISTS '
+                                            f'FOR (n:{escape(label)}) REQUIRE n.uid IS UNIQUE'))
+
+  for module, class_name, prop in RANGE_INDEXES:
+    label = node_label(module, class_name)
+    statements.append(((label, (prop,)), f'CREATE INDEX {schema_name("index", label, prop)} IF NOT EXISTS '
+                                         f'FOR (n:{escape(label)}) ON (n.{escape(prop)})'))
+
+  for module, class_name, prop in POINT_INDEXES:
+    label = node_label(module, class_name)
+    statements.append(((label, (prop,)), f'CREATE POINT INDEX {schema_name("point", label, prop)} IF NOT EXISTS '
+                                         f'FOR (n:{escape(label)}) ON (n.{escape(prop)})'))
+
+  return statements
+
+
+def bootstrap_schema(versioned:bool=False, timeout:float=ONLINE_TIMEOUT):
+  """function to create the constraints and indexes of the mars graph
+  and wait for them to be online, before the bulk writes
+  (without them each MATCH by uid scans the label)
+
+  Args:
+      versioned (bool, optional): the graph holds several builds. Defaults to False.
+      timeout (float, optional): seconds to wait for the indexes population. Defaults to ONLINE_TIMEOUT.
+
+  Raises:
+      SchemaException: the graph holds versioned builds and the schema is unversioned,
+                       an index failed or is not online after the timeout
+  """
+  from neomodel import db
+
+  if versioned:
+    # several builds hold the same uid, it is unique by build
+    for label in node_labels():
+      db.cypher_query(f"DROP CONSTRAINT {schema_name('unique', label, 'uid')} IF EXISTS")
+  else:
+    # the unique uid constraints cannot be created on the copies of the builds,
+    # and the unversioned writes would mix with the builds
+    labels = versioned_labels()
+    if labels:
+      raise SchemaException(['SCHEMA'],
+                            SchemaExceptionType.VERSIONED_DATA,
+                            f"the graph holds versioned builds (--build) in {', '.join(labels)}, "
+                            'write a new build (--build) or delete the builds before an unversioned save')
+
+  statements = schema_statements(versioned)
+  print(f'create {len(statements)} constraints and indexes')
+  for _, statement in statements:
+    db.cypher_query(statement)
+
+  # the indexes are found by label and property, an equivalent index can exist
+  # with another name (ex: created by neomodel install_labels)
+  required = [key for key, _ in statements]
+  start = time.perf_counter()
+  while True:
+    results, _ = db.cypher_query('SHOW INDEXES YIELD name, state, populationPercent, labelsOrTypes, properties '
+                                 'WHERE size(labelsOrTypes) = 1 '
+                                 'RETURN labelsOrTypes[0], properties, name, state, populationPercent')
+    indexes = {}
+    for label, properties, name, state, percent in results:
+      prop = tuple(properties)
+      if (label, prop) in required:
+        # the best state when there are several indexes on the property
+        if indexes.get((label, prop), (None, None, None))[1] != 'ONLINE':
+          indexes[(label, prop)] = (name, state, percent)
+
+    failed = [name for name, state, _ in indexes.values() if state == 'FAILED']
+    if failed:
+      raise SchemaException(['SCHEMA'],
+                            SchemaExceptionType.INDEX_FAILED,
+                            f"indexes failed : {', '.join(failed)}")
+
+    waiting = [f"{label}.{','.join(prop)}" + (f' ({indexes[(label, prop)][2]:.0f}%)' if (label, prop) in indexes else '')\
+               for label, prop in required\
+               if indexes.get((label, prop), (None, None, None))[1] != 'ONLINE']
+    if not waiting:
+      print('constraints and indexes online')
+      return
+
+    if time.perf_counter() - start > timeout:
+      raise SchemaException(['SCHEMA'],
+                            SchemaExceptionType.INDEX_TIMEOUT,
+                            f"indexes not online after {timeout}s : {', '.join(waiting)}")
+    time.sleep(1)
+
+def document_indexes(collection:str) -> List[Dict]:
+  """function to get the indexes of a documents collection
+  (partial, only the documents with the first field are indexed)
+
+  Args:
+      collection (str): collection name (ex: carrier)
+
+  Returns:
+      List[Dict]: the indexes specifications (key, name, unique, partialFilterExpression)
+  """
+  indexes = []
+  for index_collection, fields, unique in DOCUMENT_INDEXES:
+    if index_collection != collection:
+      continue
+    if unique:
+      indexes.append(keys_index(fields))
+    else:
+      indexes.append({'key': dict([(field, 1) for field in fields]),
+                      'name': '_'.join(fields) + '_index',
+                      'partialFilterExpression': {fields[0]: {'$exists': True}}})
+  return indexes
+
+def bootstrap_indexes(database, build:str=None):
+  """function to create the indexes of the documents collections
+  (they do nothing if the index exists)
+
+  Args:
+      database (Database): the pymongo database
+      build (str, optional): the build written, its collections are versioned. Defaults to None.
+  """
+  collections = list(dict.fromkeys([collection for collection, _, _ in DOCUMENT_INDEXES]))
+  print(f'create {len(DOCUMENT_INDEXES)} documents indexes')
+  for collection in collections:
+    mcollection = database.get_collection(versioned_collection(collection, build) if build else collection)
+    for index in document_indexes(collection):
+      index = dict(index)
+      mcollection.create_index(list(index.pop('key').items()), **index)
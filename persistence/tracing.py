@@ -0,0 +1,98 @@
+import json
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Tuple
+from report import RunReport
+
+# the database clients are instrumented once, for a single report
+_installed = False
+_lock = Lock()
+
+def query_command(query:str) -> str:
+  # first clause of a cypher query (ex: UNWIND, MATCH, CREATE)
+  words = query.split(None, 1)
+  return words[0].upper() if words else ''
+
+def query_size(query:str, params:Dict) -> int:
+  # bolt packs the parameters in binary, their json size is an estimate
+  return len(query.encode()) + len(json.dumps(params or {}, default=str).encode())
+
+def trace_neo4j(report:RunReport):
+  """function to record the neo4j round trips in a run report
+  all the neomodel queries (node save, connect, cardinality checks, nodes sets)
+  and the backends queries go through Database.cypher_query
+
+  Args:
+      report (RunReport): the report recording the round trips
+  """
+  from neomodel import db
+
+  Database = type(db)
+  cypher_query = Database.cypher_query
+  begin = Database.begin
+
+  def traced_cypher_query(self, query, params=None, *args, **kwargs):
+    start = perf_counter()
+    try:
+      return cypher_query(self, query, params, *args, **kwargs)
+    finally:
+      report.record_query('neo4j', query_command(query), perf_counter() - start, query_size(query, params))
+
+  def traced_begin(self, *args, **kwargs):
+    report.record_transaction('neo4j')
+    return begin(self, *args, **kwargs)
+
+  # the db object is local to each thread, the class is patched
+  Database.cypher_query = traced_cypher_query
+  Database.begin = traced_begin
+
+def trace_mongodb(report:RunReport):
+  """function to record the mongodb round trips in a run report
+  (commands of the clients created after the call)
+
+  Args:
+      report (RunReport): the report recording the round trips
+  """
+  import bson
+  from pymongo import monitoring
+
+  class RoundTripListener(monitoring.CommandListener):
+    # the events are published in the thread running the command
+    def __init__(self):
+      self.__sizes:Dict[Tuple, int] = {}
+      self.__lock = Lock()
+
+    def started(self, event):
+      size = len(bson.encode(event.command))
+      with self.__lock:
+        self.__sizes[(event.connection_id, event.request_id)] = size
+      if event.command.get('startTransaction'):
+        report.record_transaction('mongodb')
+
+    def __record(self, event):
+      with self.__lock:
+        size = self.__sizes.pop((event.connection_id, event.request_id), 0)
+      report.record_query('mongodb', event.command_name, event.duration_micros / 1e6, size)
+
+    def succeeded(self, event):
+      self.__record(event)
+
+    def failed(self, event):
+      self.__record(event)
+
+  monitoring.register(RoundTripListener())
+
+def trace_round_trips(report:RunReport):
+  """function to record the neo4j and mongodb round trips of the run in its report
+  (queries and transactions by stage, latency histogram, bytes sent)
+
+  Args:
+      report (RunReport): the report of the run
+  """
+  global _installed
+  with _lock:
+    if _installed:
+      return
+    _installed = True
+  trace_neo4j(report)
+  trace_mongodb(report)
@@ -0,0 +1,170 @@
+from datetime import datetime
+from typing import Dict, List
+from exceptions import BaseException, ExceptionType
+from persistence.graph import escape
+
+# collection of the builds registry and of the current build pointer
+BUILDS_COLLECTION = 'builds'
+POINTER_ID = 'current'
+# nodes deleted by transaction by the garbage collection
+DELETE_BATCH = 10000
+
+class BuildStatus:
+  WRITING = 'writing'
+  COMPLETE = 'complete'
+
+class BuildExceptionType(ExceptionType):
+  BUILD_UNKNOWN = "BUILD_UNKNOWN"
+  BUILD_NOT_COMPLETE = "BUILD_NOT_COMPLETE"
+
+class BuildException(BaseException):
+  def __init__(self, origin_stack:List[str], type:BuildExceptionType, description:str):
+    super().__init__(origin_stack,
+                     type,
+                     description)
+
+def new_build_id() -> str:
+  return datetime.now().strftime('%Y%m%d%H%M%S')
+
+def versioned_collection(collection:str, build:str) -> str:
+  return f'{collection}_{build}'
+
+def build_nodes(node_class:type, build:str=None) -> List:
+  """function to read the nodes of a class written by a build
+  (the graph holds the nodes of several builds, next to the unversioned nodes)
+
+  Args:
+      node_class (type): the neomodel node class (ex: Area)
+      build (str, optional): the build id, the unversioned nodes if None. Defaults to None.
+
+  Returns:
+      List: the nodes of the build
+  """
+  from neomodel import db
+  results, _ = db.cypher_query(f'MATCH (n:{escape(node_class.__label__)}) '
+                               'WHERE ($build IS NULL AND n.build IS NULL) OR n.build = $build RETURN n',
+                               {'build': build})
+  return [node_class.inflate(row[0]) for row in results]
+
+class BuildRegistry:
+  """Class used to manage the versioned (blue/green) builds of the mars data
+
+  a build writes its nodes with a build property and its documents in
+  versioned collections (ex: carrier_20240101120000), next to the build read
+  by the sequencer. the builds are registered in the builds collection:
+  {"_id": build, "status": "writing" | "complete", "collections": {"carrier": "carrier_<build>"}, ...}
+  the build read is given by the pointer document {"_id": "current", "build": ..., "previous": ...},
+  a complete build is promoted (or an old one restored) by a single update of the pointer.
+  the graph readers read the nodes of the pointer build only (build_nodes with current_build).
+  """
+  def __init__(self, mongo_config:Dict):
+    from pymongo import MongoClient
+    self.__mclient = MongoClient(mongo_config['host'], mongo_config['port'])
+    self.__database = self.__mclient.get_database(mongo_config['database'])
+    self.__builds = self.__database.get_collection(BUILDS_COLLECTION)
+
+  def current(self) -> Dict:
+    """function to get the pointer of the build read by the sequencer
+
+    Returns:
+        Dict: the pointer (build, previous, promoted), None if no build is promoted
+    """
+    return self.__builds.find_one({'_id': POINTER_ID})
+
+  def current_build(self) -> str:
+    """function to get the build read by the sequencer, its nodes are read with build_nodes
+
+    Returns:
+        str: the build id, None if no build is promoted (the unversioned nodes are read)
+    """
+    return (self.current() or {}).get('build')
+
+  def builds(self) -> List[Dict]:
+    return list(self.__builds.find({'_id': {'$ne': POINTER_ID}}).sort('started', 1))
+
+  def start(self, build:str):
+    # a resumed build keeps its start date
+    self.__builds.update_one({'_id': build},
+                             {'$set': {'status': BuildStatus.WRITING},
+                              '$setOnInsert': {'started': datetime.now(), 'collections': {}}},
+                             upsert=True)
+
+  def __collections(self, build:str) -> Dict[str, str]:
+    # versioned collections written by the build, by collection name
+    suffix = versioned_collection('', build)
+    return dict([(name[:-len(suffix)], name) for name in self.__database.list_collection_names()\
+                 if name.endswith(suffix) and len(name) > len(suffix)])
+
+  def complete(self, build:str):
+    self.__builds.update_one({'_id': build},
+                             {'$set': {'status': BuildStatus.COMPLETE,
+                                       'completed': datetime.now(),
+                                       'collections': self.__collections(build)}})
+    print(f'build {build} complete')
+
+  def promote(self, build:str):
+    """function to make a complete build the build read by the sequencer
+    (also used to roll back to a previous build)
+
+    Args:
+        build (str): the build id
+
+    Raises:
+        BuildException: the build is unknown or not complete
+    """
+    entry = self.__builds.find_one({'_id': build})
+    if not entry or build == POINTER_ID:
+      raise BuildException(['BUILDS', build],
+                           BuildExceptionType.BUILD_UNKNOWN,
+                           f'build {build} not found in the {BUILDS_COLLECTION} collection')
+    if entry['status'] != BuildStatus.COMPLETE:
+      raise BuildException(['BUILDS', build],
+                           BuildExceptionType.BUILD_NOT_COMPLETE,
+                           f"build {build} is {entry['status']}, only a complete build can be promoted")
+
+    # single document update (pipeline), the previous build is the one read until now
+    self.__builds.update_one({'_id': POINTER_ID},
+                             [{'$set': {'previous': {'$ifNull': ['$build', None]},
+                                        'build': build,
+                                        'collections': entry['collections'],
+                                        'promoted': datetime.now()}}],
+                             upsert=True)
+    print(f'build {build} promoted')
+
+  def collect_garbage(self, labels:List[str]) -> List[str]:
+    """function to delete the builds which are neither the current one nor the previous one
+    (kept for a rollback), the builds being written are not deleted
+
+    Args:
+        labels (List[str]): labels of the versioned nodes
+
+    Returns:
+        List[str]: the deleted builds
+    """
+    from neomodel import db
+
+    pointer = self.current() or {}
+    kept = [pointer.get('build'), pointer.get('previous')]
+    deleted = []
+    for entry in self.builds():
+      build = entry['_id']
+      if build in kept or entry['status'] == BuildStatus.WRITING:
+        continue
+
+      print(f'delete build {build}')
+      for label in labels:
+        count = DELETE_BATCH
+        while count == DELETE_BATCH:
+          results, _ = db.cypher_query(f'MATCH (n:{escape(label)}) WHERE n.build = $build '
+                                       f'WITH n LIMIT {DELETE_BATCH} DETACH DELETE n RETURN count(*)',
+                                       {'build': build})
+          count = results[0][0]
+      for collection in entry.get('collections', {}).values():
+        self.__database.drop_collection(collection)
+      self.__builds.delete_one({'_id': build})
+      deleted.append(build)
+
+    return deleted
+
+  def close(self):
+    self.__mclient.close()
@@ -0,0 +1,307 @@
+import inspect
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from importlib.util import find_spec
+from typing import Any, Callable, Dict, List
+from exceptions import BaseException, ExceptionType
+from cache import BuildCache
+from report import RunReport, count_rows, count_file_rows
+
+class PipelineExceptionType(ExceptionType):
+  STAGE_DUPLICATED = "PIPELINE_STAGE_DUPLICATED"
+  STAGE_UNKNOWN = "PIPELINE_STAGE_UNKNOWN"
+  DEPENDENCY_CYCLE = "PIPELINE_DEPENDENCY_CYCLE"
+  STAGE_UNAVAILABLE = "PIPELINE_STAGE_UNAVAILABLE"
+
+class PipelineException(BaseException):
+  def __init__(self, origin_stack:List[str], type:PipelineExceptionType, description:str):
+    super().__init__(origin_stack,
+                     type,
+                     description)
+
+class Stage:
+  """Class used to represent a step of the build pipeline
+
+  the stage function is called with the results of the input stages
+  as positional arguments, in the order of the inputs list.
+  the stages listed in after must be done before the stage starts
+  but their results are not passed to the function.
+  the files are the data files read by the stage, the modules are the modules
+  of the stage code (ex: actions) next to the module of the function, used to detect changes.
+  a stage not cached always runs, even if its inputs did not change.
+  """
+  def __init__(self,
+               name:str,
+               function:Callable,
+               inputs:List[str]=None,
+               after:List[str]=None,
+               files:List[str]=None,
+               modules:List[str]=None,
+               cached:bool=True):
+    self.__name = name
+    self.__function = function
+    self.__inputs = inputs if inputs else []
+    self.__after = after if after else []
+    self.__files = files if files else []
+    self.__modules = modules if modules else []
+    self.__cached = cached
+
+  @property
+  def name(self):
+    return self.__name
+
+  @property
+  def function(self):
+    return self.__function
+
+  @property
+  def inputs(self):
+    return self.__inputs
+
+  @property
+  def after(self):
+    return self.__after
+
+  @property
+  def files(self):
+    return self.__files
+
+  @property
+  def modules(self):
+    return self.__modules
+
+  @property
+  def sources(self) -> List[str]:
+    # source files of the stage code, found without importing the modules
+    sources = [inspect.getsourcefile(self.__function)]\
+              + [find_spec(module).origin for module in self.__modules]
+    return list(dict.fromkeys(sources))
+
+  @property
+  def cached(self):
+    return self.__cached
+
+  @property
+  def dependencies(self) -> List[str]:
+    return self.__inputs + [stage for stage in self.__after\
+                            if stage not in self.__inputs]
+
+  def run(self, results:Dict[str, Any], report:RunReport=None) -> Any:
+    inputs = [results[stage] for stage in self.__inputs]
+    if not report:
+      return self.__function(*inputs)
+
+    rows_in = [count_rows(data) for data in inputs]\
+              + [count_file_rows(file) for file in self.__files]
+    with report.stage(self.__name,
+                      sum([rows for rows in rows_in if rows is not None])) as record:
+      result = self.__function(*inputs)
+      record['rows_out'] = count_rows(result)
+    return result
+
+
+class Pipeline:
+  """Class used to run a DAG of stages
+
+  the execution order is deduced from the stages dependencies,
+  the stages whose dependencies are done run concurrently on a thread pool.
+  a thread pool is used (not a process pool) because the stages results
+  are collections of neomodel nodes shared by reference between stages.
+  """
+  def __init__(self, stages:List[Stage], max_workers:int=None):
+    self.__stages:Dict[str, Stage] = {}
+    for stage in stages:
+      if stage.name in self.__stages:
+        raise PipelineException(['PIPELINE'],
+                                PipelineExceptionType.STAGE_DUPLICATED,
+                                f"stage {stage.name} is defined twice")
+      self.__stages[stage.name] = stage
+
+    self.__max_workers = max_workers
+    # check the dependencies (unknown stage, cycle)
+    self.order()
+
+  @property
+  def stages(self) -> Dict[str, Stage]:
+    return self.__stages
+
+  def order(self) -> List[str]:
+    """function to get the stages names in a valid execution order
+
+    Raises:
+        PipelineException: raise if a dependency is unknown or if the dependencies contain a cycle
+
+    Returns:
+        List[str]: stages names sorted according their dependencies
+    """
+    for stage in self.__stages.values():
+      for dependency in stage.dependencies:
+        if dependency not in self.__stages:
+          raise PipelineException(['PIPELINE'],
+                                  PipelineExceptionType.STAGE_UNKNOWN,
+                                  f"stage {stage.name} depends on unknown stage {dependency}")
+
+    remaining = dict([(name, set(stage.dependencies))\
+                      for name, stage in self.__stages.items()])
+    order = []
+    while remaining:
+      ready = [name for name, dependencies in remaining.items() if not dependencies]
+      if not ready:
+        raise PipelineException(['PIPELINE'],
+                                PipelineExceptionType.DEPENDENCY_CYCLE,
+                                f"dependency cycle between stages {list(remaining.keys())}")
+      for name in ready:
+        del remaining[name]
+        order.append(name)
+      for dependencies in remaining.values():
+        dependencies.difference_update(ready)
+
+    return order
+
+  def __match(self, patterns:List[str]) -> List[str]:
+    # a pattern matches a stage name or a stage name prefix (ex: actions for actions.web)
+    matched = []
+    for pattern in patterns:
+      names = [name for name in self.__stages\
+               if name == pattern or name.startswith(pattern + '.')]
+      if not names:
+        raise PipelineException(['PIPELINE'],
+                                PipelineExceptionType.STAGE_UNKNOWN,
+                                f"no stage matches {pattern}, stages are {list(self.__stages.keys())}")
+      matched.extend(names)
+    return matched
+
+  def select(self,
+             only:List[str]=None,
+             skip:List[str]=None,
+             provide:Callable[[str], Callable]=None,
+             explicit:List[str]=None) -> 'Pipeline':
+    """function to build a pipeline running only a part of the stages
+
+    the only stages run with all the stages using their results
+    (except the explicit stages, which run only if they are in only),
+    the skip stages do not run.
+    the inputs of the selected stages which do not run are replaced
+    by stages without dependencies built with the provide function
+    (ex: load the result from the cache or the database).
+
+    Args:
+        only (List[str], optional): stages (or stage prefixes) to run. Defaults to None (all).
+        skip (List[str], optional): stages (or stage prefixes) not to run. Defaults to None.
+        provide (Callable[[str], Callable], optional): function returning the function
+          providing the result of a stage from its name. Defaults to None.
+        explicit (List[str], optional): stages (or stage prefixes) not added as users
+          of the only stages (ex: a store of all the results). Defaults to None.
+
+    Returns:
+        Pipeline: the pipeline running the selected stages
+    """
+    if only:
+      selected = set(self.__match(only))
+      explicit = set([name for name in self.__stages\
+                      for pattern in (explicit or [])\
+                      if name == pattern or name.startswith(pattern + '.')])
+      # add the stages using the results of the selected stages
+      for name in self.order():
+        if set(self.__stages[name].inputs) & selected and name not in explicit:
+          selected.add(name)
+    else:
+      selected = set(self.__stages.keys())
+
+    if skip:
+      selected.difference_update(self.__match(skip))
+
+    stages = []
+    provided = []
+    for name in self.order():
+      if name not in selected:
+        continue
+      stage = self.__stages[name]
+      # the after dependencies not selected are considered done
+      stages.append(Stage(name,
+                          stage.function,
+                          stage.inputs,
+                          [dependency for dependency in stage.after if dependency in selected],
+                          stage.files,
+                          stage.cached))
+      provided.extend([dependency for dependency in stage.inputs\
+                       if dependency not in selected and dependency not in provided])
+
+    for name in provided:
+      if not provide:
+        raise PipelineException(['PIPELINE'],
+                                PipelineExceptionType.STAGE_UNAVAILABLE,
+                                f"stage {name} is needed but not selected")
+      stages.append(Stage(name, provide(name), cached=False))
+
+    return Pipeline(stages, self.__max_workers)
+
+  def run(self, cache:BuildCache=None, report:RunReport=None) -> Dict[str, Any]:
+    """function to run all the stages, independent stages run at the same time
+
+    Args:
+        cache (BuildCache, optional): cache of the previous run results,
+          if set the stages whose inputs did not change are skipped. Defaults to None.
+        report (RunReport, optional): report collecting the stages timings. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: the result of each stage by stage name
+    """
+    results = {}
+    keys = {}
+    remaining = dict([(name, set(stage.dependencies))\
+                      for name, stage in self.__stages.items()])
+    running = {}
+
+    def complete(name:str, result:Any):
+      results[name] = result
+      for dependencies in remaining.values():
+        dependencies.discard(name)
+
+    try:
+      with ThreadPoolExecutor(max_workers=self.__max_workers) as executor:
+        while remaining or running:
+          # submit all the stages whose dependencies are done
+          # loop while cached stages complete immediately
+          ready = [name for name, dependencies in remaining.items() if not dependencies]
+          while ready:
+            for name in ready:
+              del remaining[name]
+              stage = self.__stages[name]
+
+              if cache:
+                keys[name] = cache.stage_key(name,
+                                             stage.files,
+                                             [keys[dependency] for dependency in stage.dependencies],
+                                             stage.sources)
+                hit, result = cache.get(name, keys[name])
+                if hit and stage.cached:
+                  print(f'stage {name} unchanged, use cached result')
+                  if report:
+                    report.cached_stage(name, count_rows(result))
+                  complete(name, result)
+                  continue
+
+              print(f'start stage {name}')
+              future = executor.submit(stage.run, results, report)
+              running[future] = name
+
+            ready = [name for name, dependencies in remaining.items() if not dependencies]
+
+          if not running:
+            continue
+
+          done, _ = wait(running, return_when=FIRST_COMPLETED)
+          for future in done:
+            name = running.pop(future)
+            # raise the stage exception if the stage failed
+            result = future.result()
+            print(f'stage {name} done')
+            if cache and self.__stages[name].cached:
+              cache.put(name, keys[name], result)
+            complete(name, result)
+    finally:
+      # keep the results of the stages done even if a stage failed
+      if cache:
+        cache.dump()
+
+    return results
@@ -0,0 +1,206 @@
+import json
+import os
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Lock, local
+from time import perf_counter, thread_time
+from typing import Any, Dict
+
+# the stage running in the current thread
+_current = local()
+
+# upper bounds (milliseconds) of the database round trips latency histogram
+LATENCY_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+def set_current_stage(name:str):
+  _current.stage = name
+
+def current_stage() -> str:
+  return getattr(_current, 'stage', None)
+
+def count_rows(data:Any) -> int:
+  """function to count the rows of a stage input or output
+
+  Args:
+      data (Any): a *Data object, a collection or a collection of collections
+
+  Returns:
+      int: number of rows, None if the data are not countable
+  """
+  if data is None:
+    return None
+  if isinstance(data, dict) and data and all([isinstance(value, dict) for value in data.values()]):
+    return sum([len(value) for value in data.values()])
+  if hasattr(data, '__len__'):
+    return len(data)
+  return None
+
+def count_file_rows(file_path:str) -> int:
+  """function to count the rows of a data file (csv lines or json records)
+
+  Args:
+      file_path (str): path of the file
+
+  Returns:
+      int: number of rows, None if the format is not countable
+  """
+  if file_path.endswith('.csv'):
+    with open(file_path, 'r') as f:
+      return max(sum([1 for line in f if line.strip()]) - 1, 0)
+  if file_path.endswith('.json'):
+    with open(file_path, 'r') as f:
+      content = json.load(f)
+    return len(content) if isinstance(content, list) else None
+  return None
+
+class RunReport:
+  """Class used to collect the timings of a run
+
+  for each stage : wall time, cpu time, rows in and rows out
+  for each persistence call type of a stage (nodes, relationships, documents):
+  number of elements written, time spent and elements per second
+  with trace_memory, the peak of the python memory allocated during each stage
+  (tracemalloc, slower, the stages must run one at a time to get a peak per stage)
+  for each database (neo4j, mongodb) of a stage: number of queries by command,
+  transactions, bytes sent, time spent and latency histogram of the round trips
+  """
+  def __init__(self, trace_memory:bool=False):
+    self.__started = datetime.now()
+    self.__start = perf_counter()
+    self.__stages:Dict[str, Dict] = {}
+    self.__writes:Dict[str, Dict[str, Dict]] = {}
+    self.__round_trips:Dict[str, Dict[str, Dict]] = {}
+    self.__lock = Lock()
+    self.__trace_memory = trace_memory
+
+    if trace_memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+
+  @contextmanager
+  def stage(self, name:str, rows_in:int=None):
+    """context manager measuring a stage running in the current thread
+
+    Args:
+        name (str): stage name
+        rows_in (int, optional): number of rows in. Defaults to None.
+
+    Yields:
+        Dict: the stage record, rows_out can be set in the context
+    """
+    record = {'cached': False, 'rows_in': rows_in, 'rows_out': None}
+    set_current_stage(name)
+    if self.__trace_memory:
+      tracemalloc.reset_peak()
+    start, start_cpu = perf_counter(), thread_time()
+    try:
+      yield record
+    finally:
+      record['wall_time'] = round(perf_counter() - start, 6)
+      record['cpu_time'] = round(thread_time() - start_cpu, 6)
+      if self.__trace_memory:
+        record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+      set_current_stage(None)
+      with self.__lock:
+        self.__stages[name] = record
+
+  def cached_stage(self, name:str, rows_out:int=None):
+    with self.__lock:
+      self.__stages[name] = {'cached': True,
+                             'rows_in': None,
+                             'rows_out': rows_out,
+                             'wall_time': 0.0,
+                             'cpu_time': 0.0}
+
+  def record_write(self, kind:str, count:int, duration:float):
+    """function to record a persistence call of the current stage
+
+    Args:
+        kind (str): type of the written elements (nodes, relationships, documents)
+        count (int): number of written elements
+        duration (float): duration of the call in seconds
+    """
+    stage = current_stage() or 'unknown'
+    with self.__lock:
+      writes = self.__writes.setdefault(stage, {}).setdefault(kind, {'calls': 0, 'count': 0, 'time': 0.0})
+      writes['calls'] += 1
+      writes['count'] += count
+      writes['time'] += duration
+
+  def __database_round_trips(self, database:str) -> Dict:
+    stage = current_stage() or 'unknown'
+    return self.__round_trips.setdefault(stage, {})\
+                             .setdefault(database, {'queries': 0,
+                                                    'transactions': 0,
+                                                    'bytes_sent': 0,
+                                                    'time': 0.0,
+                                                    'commands': {},
+                                                    'latency': [0] * (len(LATENCY_BUCKETS) + 1)})
+
+  def record_query(self, database:str, command:str, duration:float, bytes_sent:int):
+    """function to record a database round trip of the current stage
+
+    Args:
+        database (str): database name (neo4j, mongodb)
+        command (str): type of query (ex: insert, find, MATCH, CREATE)
+        duration (float): round trip duration in seconds
+        bytes_sent (int): size of the query and its parameters
+    """
+    bucket = len(LATENCY_BUCKETS)
+    for index, bound in enumerate(LATENCY_BUCKETS):
+      if duration * 1000 <= bound:
+        bucket = index
+        break
+
+    with self.__lock:
+      round_trips = self.__database_round_trips(database)
+      round_trips['queries'] += 1
+      round_trips['bytes_sent'] += bytes_sent
+      round_trips['time'] += duration
+      round_trips['commands'][command] = round_trips['commands'].get(command, 0) + 1
+      round_trips['latency'][bucket] += 1
+
+  def record_transaction(self, database:str):
+    with self.__lock:
+      self.__database_round_trips(database)['transactions'] += 1
+
+  def to_dict(self) -> Dict:
+    persistence = {}
+    for stage, kinds in self.__writes.items():
+      persistence[stage] = {}
+      for kind, writes in kinds.items():
+        per_second = writes['count'] / writes['time'] if writes['time'] else None
+        persistence[stage][kind] = {'calls': writes['calls'],
+                                    'count': writes['count'],
+                                    'time': round(writes['time'], 6),
+                                    'per_second': round(per_second, 1) if per_second else None}
+
+    labels = [f'<={bound}' for bound in LATENCY_BUCKETS] + [f'>{LATENCY_BUCKETS[-1]}']
+    round_trips = {}
+    for stage, databases in self.__round_trips.items():
+      round_trips[stage] = {}
+      for database, trips in databases.items():
+        round_trips[stage][database] = {'queries': trips['queries'],
+                                        'transactions': trips['transactions'],
+                                        'bytes_sent': trips['bytes_sent'],
+                                        'time': round(trips['time'], 6),
+                                        'commands': trips['commands'],
+                                        'latency_ms': dict(zip(labels, trips['latency']))}
+
+    report = {
+      'started': self.__started.isoformat(),
+      'wall_time': round(perf_counter() - self.__start, 6),
+      'stages': self.__stages,
+      'persistence': persistence,
+      'round_trips': round_trips
+    }
+    if self.__trace_memory:
+      report['peak_memory'] = max([stage.get('peak_memory', 0) for stage in self.__stages.values()] + [0])
+    return report
+
+  def write(self, report_file:str):
+    directory = os.path.dirname(report_file)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    with open(report_file, 'w') as f:
+      json.dump(self.to_dict(), f, indent=2)
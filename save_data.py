@@ -1,21 +1,16 @@
 # from neo4mars import process
-from parts import PartsData
-from pattern import PatternData
-from assemblies import AssembliesData
-from operations import OperationsData
-from actions import ActionsData
-from states import StatesData
-
-from assets import AssetsData
-from neomodel import config
+from pipeline import Pipeline, PipelineException, PipelineExceptionType, Stage
+from cache import BuildCache
+from artifacts import ArtifactStore
+from report import RunReport
+from importlib import import_module
+from typing import Dict, List, Tuple
+import argparse
 import os
-import warnings
-from pandas.core.common import SettingWithCopyWarning
+import sys
 
-warnings.simplefilter(action="ignore", category=SettingWithCopyWarning)
-
-bolt_url = os.environ['NEO4J_BOLT_URL']
-config.DATABASE_URL = bolt_url
+# the data modules (pandas, neomodel, pymongo...) are imported by the stages functions
+# only the stages selected in the command line pay for their imports
 
 MARS_CONFIG = {
   "database": {
@@ -27,71 +22,452 @@ MARS_CONFIG = {
     }
   }
 
-import model
-import mars
-
-model.COMMAND_REGISTER, model.EQUIPMENT, model.REFERENCE = mars.COMMAND_REGISTER, mars.EQUIPMENT, mars.REFERENCE
-
-
-'''
-bolt_url = os.environ['NEO4J_BOLT_URL']
-config.DATABASE_URL = bolt_url
-'''
-
 FASTENERS = "./data/fasteners.json"
 CHCONF_INJESTION = "./data/change_conf_injestion.csv"
 WEB_INJESTION = "./data/web_injestion.csv"
 FLANGE_INJESTION = "./data/flange_injestion.csv"
 MANIPULATIONS = "./data/manipulations.yaml"
-MOVEMENTS = "./data/movements.yaml" 
-PARTS = "./data/parts.csv" 
+MOVEMENTS = "./data/movements.yaml"
+PARTS = "./data/parts.csv"
 ASSETS = "./data/assets.yaml"
+BUILD_CACHE = "./.build/cache.pickle"
+ARTIFACTS = "./.build/artifacts.pickle"
+REPORT = "./.build/report.json"
+JOURNAL = "./.build/journal.jsonl"
+TRANSACTION_BATCH = 500
+STATEMENT_ROWS = 1000
+DOCUMENTS_CHUNK = 1000
+GRAPH_WRITERS = 4
+# nodes connected to most of the nodes of a stage (ex: web area, mars asset, operation classes),
+# the writers threads write their relationships one at a time
+HUB_CLASSES = [('neo4mars.process.area', 'Area'),
+               ('neo4mars.resource.asset', 'Carrier'),
+               ('neo4mars.resource.asset', 'EndEffector'),
+               ('neo4mars.resource.situation', 'StateObject'),
+               ('neo4mars.product.fastener', 'Class'),
+               ('neo4mars.process.operation', 'Class')]
+# nodes shared by the rails, hubs of their class : (module, function selecting the node)
+# the crossbeam part instance is assembled by the rear flange assemblies of all the rails
+HUB_NODES = [('parts', 'PartsData.is_shared_instance')]
+
+DATA_STAGES = ['pattern', 'parts', 'assemblies', 'operations',
+               'states', 'assets', 'actions']
+
+def build_pattern():
+  from pattern import PatternData
+  return PatternData.build()
+
+def build_parts():
+  from parts import PartsData
+  return PartsData.build_from_file(PARTS)
+
+def build_assemblies(parts:'PartsData', pattern:'PatternData'):
+  from assemblies import AssembliesData
+  return AssembliesData.build_from_file(source_file=FASTENERS,
+                                        parts_data= parts,
+                                        pattern_data=pattern)
+
+def build_assemblies_uids(assemblies:'AssembliesData'):
+  # get collection of assemblies uid forfollowing processing
+  return dict([(key, value.node.uid)\
+               for key, value in assemblies.assemblies.items()])
+
+def build_operations(assemblies:'AssembliesData'):
+  from operations import OperationsData
+  return OperationsData.build(assemblies)
+
+def build_states():
+  from states import StatesData
+  return StatesData.build()
 
-print('build data')
-print('build pattern data')
-pattern = PatternData.build()
-print('build parts data')
-parts = PartsData.build_from_file(PARTS)
-print('build assemblies data')
-assemblies = AssembliesData.build_from_file(source_file=FASTENERS,
-                                            parts_data= parts,
-                                            pattern_data=pattern)
-
-# get collection of assemblies uid forfollowing processing
-assemblies_uids = dict([(key, value.node.uid)\
-                       for key, value in assemblies.assemblies.items()])
-
-print('build operations data')
-operations = OperationsData.build(assemblies)
-
-print('build states data')
-states = StatesData.build()
-
-print('build assets data')
-assets = AssetsData.build_from_file(ASSETS)
-
-print('build actions data')
-actions = ActionsData.build_from_files(CHCONF_INJESTION,
-                                         WEB_INJESTION,
-                                         FLANGE_INJESTION,
-                                         MANIPULATIONS,
-                                         MOVEMENTS,
+def build_assets():
+  from assets import AssetsData
+  return AssetsData.build_from_file(ASSETS)
+
+def build_manipulations(states:'StatesData', assets:'AssetsData'):
+  from actions import ActionsData
+  return ActionsData.build_manipulations(MANIPULATIONS,
                                          states,
-                                         operations,
-                                         assemblies_uids,
-                                         assets,
-                                         pattern)
+                                         assets)
+
+def build_area_movements(rail_area:str, movements_file:str):
+  def build(states:'StatesData',
+            assemblies_uids:Dict[str, str],
+            assets:'AssetsData',
+            pattern:'PatternData'):
+    from actions import ActionsData
+    return ActionsData.build_movements(rail_area,
+                                       movements_file,
+                                       MOVEMENTS,
+                                       states,
+                                       assemblies_uids,
+                                       assets,
+                                       pattern)
+  return build
+
+def build_config_movements(states:'StatesData'):
+  from actions import ActionsData
+  return ActionsData.build_config_movements(CHCONF_INJESTION,
+                                            MOVEMENTS,
+                                            states)
+
+def build_actions(manipulations, web_movements, flange_movements, config_movements,
+                  states:'StatesData', operations:'OperationsData', assets:'AssetsData'):
+  from actions import ActionsData
+  return ActionsData.build(manipulations,
+                           [web_movements, flange_movements],
+                           config_movements,
+                           states,
+                           operations,
+                           assets)
+
+def write_artifacts(*data):
+  ArtifactStore(ARTIFACTS).write(dict(zip(DATA_STAGES, data)))
+
+def read_artifacts():
+  return ArtifactStore(ARTIFACTS).read()
+
+def load(name:str, module:str, data_class:str):
+  # build a stage function rebuilding a data object from the artifacts records
+  def load_data(artifacts:Dict, *upstream):
+    data_type = getattr(import_module(module), data_class)
+    return data_type.from_records(artifacts[name], *upstream)
+  return load_data
+
+def save(backend:'Backend'):
+  def save_data(data):
+    data.save_data(backend)
+  return save_data
+
+# modules of the actions code, the actions stages run again when they change
+ACTIONS_MODULES = ['actions', 'model.action', 'model.definition', 'model.movement', 'model.equipment']
+
+# build stages, the execution order is deduced from the inputs
+# the files and the stages modules are hashed to skip the stages whose inputs did not change
+BUILD_STAGES = [
+  Stage('pattern', build_pattern, modules=['pattern']),
+  Stage('parts', build_parts, files=[PARTS], modules=['parts', 'df_functions']),
+  Stage('states', build_states, modules=['states']),
+  Stage('assets', build_assets, files=[ASSETS], modules=['assets']),
+  Stage('assemblies', build_assemblies, inputs=['parts', 'pattern'], files=[FASTENERS],
+        modules=['assemblies', 'df_functions']),
+  Stage('assemblies.uids', build_assemblies_uids, inputs=['assemblies'], modules=['assemblies']),
+  Stage('operations', build_operations, inputs=['assemblies'], modules=['operations']),
+  Stage('actions.manipulations', build_manipulations, inputs=['states', 'assets'],
+        files=[MANIPULATIONS], modules=ACTIONS_MODULES),
+  Stage('actions.web', build_area_movements('web', WEB_INJESTION),
+        inputs=['states', 'assemblies.uids', 'assets', 'pattern'],
+        files=[WEB_INJESTION, MOVEMENTS], modules=ACTIONS_MODULES),
+  Stage('actions.flange', build_area_movements('flange', FLANGE_INJESTION),
+        inputs=['states', 'assemblies.uids', 'assets', 'pattern'],
+        files=[FLANGE_INJESTION, MOVEMENTS], modules=ACTIONS_MODULES),
+  Stage('actions.config', build_config_movements, inputs=['states'],
+        files=[CHCONF_INJESTION, MOVEMENTS], modules=ACTIONS_MODULES),
+  Stage('actions', build_actions,
+        inputs=['actions.manipulations', 'actions.web', 'actions.flange',
+                'actions.config', 'states', 'operations', 'assets'],
+        modules=ACTIONS_MODULES),
+  Stage('artifacts', write_artifacts, inputs=DATA_STAGES, modules=['artifacts'])
+]
+
+# load stages, rebuild the data objects from the artifacts of a previous build
+LOAD_STAGES = [
+  Stage('artifacts', read_artifacts, files=[ARTIFACTS], modules=['artifacts']),
+  Stage('pattern', load('pattern', 'pattern', 'PatternData'), inputs=['artifacts'], modules=['pattern']),
+  Stage('parts', load('parts', 'parts', 'PartsData'), inputs=['artifacts'], modules=['parts']),
+  Stage('states', load('states', 'states', 'StatesData'), inputs=['artifacts'], modules=['states']),
+  Stage('assets', load('assets', 'assets', 'AssetsData'), inputs=['artifacts'], modules=['assets']),
+  Stage('assemblies', load('assemblies', 'assemblies', 'AssembliesData'),
+        inputs=['artifacts', 'parts', 'pattern'], modules=['assemblies']),
+  Stage('operations', load('operations', 'operations', 'OperationsData'),
+        inputs=['artifacts', 'assemblies'], modules=['operations']),
+  Stage('actions', load('actions', 'actions', 'ActionsData'),
+        inputs=['artifacts', 'states', 'operations', 'assets', 'pattern'], modules=ACTIONS_MODULES)
+]
+
+def save_stages(backend:'Backend'):
+  # save stages, nodes must be saved before the nodes connected to them
+  # the save phase starts once the artifacts of the build are stored
+  # the save stages are never cached : the cache knows the artifacts, not the content of the
+  # target (wiped database, other target or write mode), and a save of a part of the data
+  # would duplicate the nodes already created
+  save_data = save(backend)
+  return [
+    Stage('save.pattern', save_data, inputs=['pattern'], after=['artifacts'], cached=False),
+    Stage('save.parts', save_data, inputs=['parts'], after=['artifacts'], cached=False),
+    Stage('save.states', save_data, inputs=['states'], after=['artifacts'], cached=False),
+    Stage('save.assets', save_data, inputs=['assets'], after=['artifacts'], cached=False),
+    Stage('save.assemblies', save_data, inputs=['assemblies'],
+          after=['save.parts', 'save.pattern'], cached=False),
+    Stage('save.operations', save_data, inputs=['operations'],
+          after=['save.assemblies'], cached=False),
+    Stage('save.actions', save_data, inputs=['actions'],
+          after=['save.states', 'save.assets', 'save.pattern', 'save.operations'], cached=False)
+  ]
+
+# stages results which can be read from the database when they are not rebuilt
+DATABASE_LOADERS = {
+  'pattern': ('pattern', 'PatternData.from_database'),
+  'states': ('states', 'StatesData.from_database'),
+  'assets': ('assets', 'AssetsData.from_database'),
+  'assemblies.uids': ('assemblies', 'AssembliesData.uids_from_database')
+}
+
+def current_build() -> str:
+  # build read by the sequencer, the database loaders read its nodes
+  from persistence import BuildRegistry
+  registry = BuildRegistry(MARS_CONFIG['database'])
+  try:
+    return registry.current_build()
+  finally:
+    registry.close()
+
+def provide(cache:BuildCache):
+  # build the function providing the result of a stage not selected
+  # from the build cache, or else from the database (the build read by the sequencer)
+  def provider(name:str):
+    def load_stage():
+      if cache:
+        hit, result = cache.latest(name)
+        if hit:
+          print(f'stage {name} loaded from the build cache')
+          return result
+
+      loader = DATABASE_LOADERS.get(name)
+      if loader:
+        module, function = loader
+        data_class, method = function.split('.')
+        print(f'stage {name} loaded from the database')
+        return getattr(getattr(import_module(module), data_class), method)(current_build())
+
+      raise PipelineException(['PIPELINE', name],
+                              PipelineExceptionType.STAGE_UNAVAILABLE,
+                              f"stage {name} is not in the build cache and can not be read from the database, select it")
+    return load_stage
+  return provider
+
+def stage_batch_size(value:str) -> Tuple[str, int]:
+  # parse a STAGE=N argument
+  stage, _, size = value.partition('=')
+  if not stage.startswith('save.') or not size.isdigit() or int(size) < 1:
+    raise argparse.ArgumentTypeError(f"{value} is not a save stage batch size (ex: save.assemblies=200)")
+  return stage, int(size)
+
+def parse_args(argv:List[str]=None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description='build the mars data and save them in neo4j and mongodb')
+  parser.add_argument('--only', metavar='STAGE', nargs='+', action='extend',
+                      help='run only these stages (or stage prefixes, ex: actions.flange) and the stages depending on them '
+                           '(the artifacts and save stages run only if they are selected, ex: save)')
+  parser.add_argument('--skip', metavar='STAGE', nargs='+', action='extend',
+                      help='do not run these stages (or stage prefixes, ex: assemblies)')
+  parser.add_argument('--list', action='store_true',
+                      help='print the stages in execution order and exit')
+  parser.add_argument('--save-only', action='store_true',
+                      help=f'do not build, save the artifacts of the last build ({ARTIFACTS})')
+  output = parser.add_mutually_exclusive_group()
+  output.add_argument('--export', metavar='DIRECTORY',
+                      help='write a cypher and ndjson bundle in DIRECTORY instead of the databases')
+  output.add_argument('--admin-import', metavar='DIRECTORY',
+                      help='write the neo4j-admin import csv files (and the ndjson documents) in DIRECTORY '
+                           'instead of the databases, to load an empty database')
+  output.add_argument('--delta', action='store_true',
+                      help='compare the build with the databases and write only the inserts, updates and deletes '
+                           '(all the save stages must run)')
+  parser.add_argument('--documents-format', choices=['ndjson', 'bson', 'bson.gz'], default='ndjson',
+                      help='with --export or --admin-import, write the documents as mongoimport ndjson files or as a '
+                           'mongodump directory loaded by mongorestore (bson.gz: gzipped) (default ndjson)')
+  parser.add_argument('--dry-run', action='store_true',
+                      help='with --delta, print the summary of the delta without applying it')
+  parser.add_argument('--statement-rows', metavar='N', type=int, default=STATEMENT_ROWS,
+                      help=f'maximum number of rows of a bulk (UNWIND) statement (default {STATEMENT_ROWS})')
+  parser.add_argument('--documents-chunk', metavar='N', type=int, default=DOCUMENTS_CHUNK,
+                      help=f'maximum number of documents of a mongodb bulk write (default {DOCUMENTS_CHUNK})')
+  parser.add_argument('--batch-size', metavar='N', type=int, default=TRANSACTION_BATCH,
+                      help=f'number of definitions (a node and its relationships) written in a transaction (default {TRANSACTION_BATCH})')
+  parser.add_argument('--stage-batch-size', metavar='STAGE=N', type=stage_batch_size, action='append',
+                      help='number of definitions written in a transaction for a save stage (ex: save.assemblies=200)')
+  parser.add_argument('--writers', metavar='N', type=int, default=GRAPH_WRITERS,
+                      help=f'number of threads writing the assemblies, operations and actions by rail (default {GRAPH_WRITERS})')
+  parser.add_argument('--upsert', action='store_true',
+                      help='merge the nodes and relationships on their uid and replace the documents '
+                           'instead of creating them, the save can run again on a loaded database')
+  parser.add_argument('--build', metavar='ID', nargs='?', const='',
+                      help='write the save in a new build (or the build ID), next to the build read by the sequencer '
+                           'until it is promoted')
+  parser.add_argument('--promote', metavar='ID',
+                      help='make the complete build ID the build read by the sequencer (or roll back to it) and exit')
+  parser.add_argument('--gc', action='store_true',
+                      help='delete the builds which are neither the current build nor the previous one and exit')
+  parser.add_argument('--resume', action='store_true',
+                      help=f'resume an interrupted save from the last batch committed in the write journal ({JOURNAL}), '
+                           'the data must be the same (build cache or --save-only) with the same batch sizes')
+  parser.add_argument('--no-cache', action='store_true',
+                      help=f'rebuild all the selected stages, do not use the build cache ({BUILD_CACHE})')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='number of stages running at the same time')
+  parser.add_argument('--trace-memory', action='store_true',
+                      help='record the memory peak of each stage in the report (slower, use --workers 1)')
+  parser.add_argument('--report', metavar='FILE', default=REPORT,
+                      help=f'timing and throughput report of the run (default {REPORT})')
+  args = parser.parse_args(argv)
+  if args.delta and (args.only or args.skip):
+    # what is not built is deleted from the databases
+    parser.error('--delta compares the whole build with the databases, it cannot run with --only or --skip')
+  if args.dry_run and not args.delta:
+    parser.error('--dry-run requires --delta')
+  if args.documents_format != 'ndjson' and not (args.export or args.admin_import):
+    parser.error('--documents-format requires --export or --admin-import')
+  if args.build is not None and (args.export or args.admin_import or args.delta):
+    parser.error('--build writes a new build in the databases, it cannot run with --export, --admin-import or --delta')
+  if args.build is not None and (args.only or args.skip):
+    # a promoted build must contain all the data
+    parser.error('--build writes all the data in the build, it cannot run with --only or --skip')
+  args.stage_batch_size = dict(args.stage_batch_size or [])
+  return args
+
+def connect_neo4j():
+  from neomodel import config
+  bolt_url = os.environ['NEO4J_BOLT_URL']
+  config.DATABASE_URL = bolt_url
+
+def manage_builds(args:argparse.Namespace):
+  # promote a build or delete the old builds
+  from persistence import BuildRegistry, node_labels
+
+  connect_neo4j()
+  registry = BuildRegistry(MARS_CONFIG['database'])
+  try:
+    if args.promote:
+      registry.promote(args.promote)
+    if args.gc:
+      deleted = registry.collect_garbage(node_labels())
+      print(f"{len(deleted)} builds deleted {', '.join(deleted)}")
+    pointer = registry.current() or {}
+    print(f"current build {pointer.get('build')}, previous build {pointer.get('previous')}")
+  finally:
+    registry.close()
+
+def build_backend(args:argparse.Namespace, report:RunReport) -> 'Backend':
+  from persistence import LiveBackend, ExportBackend, AdminImportBackend, DeltaBackend,\
+                          InstrumentedBackend, JournaledBackend, WriteJournal, trace_round_trips
+
+  if args.export:
+    backend = ExportBackend(args.export,
+                            args.statement_rows,
+                            args.documents_format,
+                            MARS_CONFIG['database']['database'])
+  elif args.admin_import:
+    backend = AdminImportBackend(args.admin_import,
+                                 args.documents_format,
+                                 MARS_CONFIG['database']['database'])
+  else:
+    connect_neo4j()
+    # queries, transactions and latencies of the databases in the report
+    trace_round_trips(report)
+
+    if args.delta:
+      backend = DeltaBackend(MARS_CONFIG['database'], args.statement_rows, args.dry_run)
+    else:
+      # the batches committed are recorded in the journal, a new save starts a new journal
+      journal = WriteJournal(JOURNAL)
+      if args.resume:
+        print(f'resume the save, {len(journal)} batches committed in {JOURNAL}')
+      else:
+        journal.clear()
+      hub_classes = tuple([getattr(import_module(module), class_name) for module, class_name in HUB_CLASSES])
+      hub_nodes_functions = []
+      for module, function in HUB_NODES:
+        data_class, method = function.split('.')
+        hub_nodes_functions.append(getattr(getattr(import_module(module), data_class), method))
+
+      def hub_nodes(node) -> bool:
+        return any([is_hub(node) for is_hub in hub_nodes_functions])
+
+      if args.build is not None:
+        from persistence import BuildRegistry, new_build_id
+        args.build = args.build or new_build_id()
+        registry = BuildRegistry(MARS_CONFIG['database'])
+        registry.start(args.build)
+        registry.close()
+        print(f'write the build {args.build}')
+      # the live backend is measured under the journal : the hub relationships
+      # deferred to the end of the batches are recorded when they are written
+      return JournaledBackend(InstrumentedBackend(LiveBackend(MARS_CONFIG['database'],
+                                                              args.statement_rows,
+                                                              args.upsert,
+                                                              args.build,
+                                                              args.documents_chunk),
+                                                  report),
+                              journal,
+                              args.batch_size,
+                              args.stage_batch_size,
+                              args.writers,
+                              hub_classes,
+                              hub_nodes)
+
+  return InstrumentedBackend(backend, report)
+
+def main(argv:List[str]=None):
+  args = parse_args(argv)
+
+  if args.promote or args.gc:
+    manage_builds(args)
+    return
+
+  report = RunReport(args.trace_memory)
+  cache = None if args.no_cache or args.save_only else BuildCache(BUILD_CACHE)
+
+  def select(backend:'Backend') -> Pipeline:
+    if args.save_only:
+      stages = LOAD_STAGES + save_stages(backend)
+    else:
+      stages = BUILD_STAGES + save_stages(backend)
+    # the artifacts store all the data, a partial build does not write them.
+    # the saves run with --only if they are selected : a save of rebuilt data in create mode
+    # duplicates the nodes already in the database
+    return Pipeline(stages, args.workers).select(args.only,
+                                                 args.skip,
+                                                 provide(cache),
+                                                 explicit=['artifacts', 'save'])
+
+  # select the stages first, the backend (database connections) is only built
+  # if a save stage is selected
+  pipeline = select(None)
+  if args.list:
+    print('\n'.join(pipeline.order()))
+    return
+
+  saving = any([name.startswith('save.') for name in pipeline.stages])
+  backend = build_backend(args, report) if saving else None
+  pipeline = select(backend)
 
-print('ok build')
+  import warnings
+  from pandas.core.common import SettingWithCopyWarning
+  warnings.simplefilter(action="ignore", category=SettingWithCopyWarning)
 
-print('save data')
-pattern.save_data()
-parts.save_data()
-assemblies.save_data()
-operations.save_data()
-states.save_data()
-assets.save_data()
-actions.save_data()
-print('ok save')
+  # register the mars equipments and references used to build the actions
+  import model
+  import mars
+  model.COMMAND_REGISTER, model.EQUIPMENT, model.REFERENCE = mars.COMMAND_REGISTER, mars.EQUIPMENT, mars.REFERENCE
 
+  try:
+    if saving:
+      # the constraints and indexes are online before the first write
+      backend.create_schema()
+    print('save data from build artifacts' if args.save_only else 'build and save data')
+    pipeline.run(cache, report)
+    if saving:
+      backend.close()
+      if args.build is not None:
+        from persistence import BuildRegistry
+        registry = BuildRegistry(MARS_CONFIG['database'])
+        registry.complete(args.build)
+        registry.close()
+        print(f'promote the build with --promote {args.build}')
+    print('ok save')
+  finally:
+    report.write(args.report)
+    print(f'run report in {args.report}')
 
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -2,7 +2,8 @@ from neomodel.core import StructuredNode
 from enum import Enum
 from neo4mars.resource.situation import StateObject
 from typing import Dict, List, Tuple
-from utils import BasicDefinition
+from utils import BasicDefinition, node_to_record
+from persistence import Backend, build_nodes
 
 
 class Relation(Enum):
@@ -37,6 +38,13 @@ class StateRS:
       "relation": self.__relation.value
     }
 
+  def to_record(self) -> Dict:
+    return {
+      "node": self.__property_node.uid,
+      "relation": self.__relation.name,
+      "state": self.__state
+    }
+
 class PreconditionRS(StateRS):
   def __init__(self,
                property_node:StructuredNode,
@@ -60,6 +68,22 @@ class PreconditionRS(StateRS):
     definition["priority"] = self.__priority
     return definition
 
+  def to_record(self) -> Dict:
+    record = super().to_record()
+    record["priority"] = self.__priority
+    return record
+
+  @classmethod
+  def from_record(cls, record:Dict,
+                  nodes:Dict[str, StructuredNode]) -> 'PreconditionRS':
+    property_node = nodes.get(record['node'])
+    assert property_node, f"{record['node']} not found in nodes collection"
+
+    return cls(property_node=property_node,
+               relation=Relation[record['relation']],
+               state=record['state'],
+               priority=record['priority'])
+
 class ResultRS(StateRS):
   def __init__(self,
                property_node:StructuredNode,
@@ -79,6 +103,22 @@ class ResultRS(StateRS):
     definition["description"] = self.__description
     return definition
 
+  def to_record(self) -> Dict:
+    record = super().to_record()
+    record["description"] = self.__description
+    return record
+
+  @classmethod
+  def from_record(cls, record:Dict,
+                  nodes:Dict[str, StructuredNode]) -> 'ResultRS':
+    property_node = nodes.get(record['node'])
+    assert property_node, f"{record['node']} not found in nodes collection"
+
+    return cls(property_node=property_node,
+               relation=Relation[record['relation']],
+               state=record['state'],
+               description=record['description'])
+
 class SCDefinition (BasicDefinition):
   def __init__(self,
                node:StructuredNode,
@@ -117,6 +157,9 @@ class StatesData:
   def states(self):
     return self.__states
 
+  def __len__(self):
+    return len(self.__states)
+
   @staticmethod
   def generate_probing_uid(rail_position:str, side:str):
     if side == 'front':
@@ -163,6 +206,27 @@ class StatesData:
 
     return assy_probe_collection
 
-  def save_data(self):
-    for state_def in self.__states.values():
-      state_def.node.save()
+  def to_records(self) -> Dict:
+    return {
+      'states': [node_to_record(state_def.node) for state_def in self.__states.values()]
+    }
+
+  @classmethod
+  def from_records(cls, records:Dict) -> 'StatesData':
+    states_collection = {}
+    for record in records['states']:
+      states_collection[record['uid']] = BasicDefinition(StateObject(**record))
+
+    return cls(states_collection)
+
+  @classmethod
+  def from_database(cls, build:str=None) -> 'StatesData':
+    states_collection = dict([(state.uid, BasicDefinition(state))\
+                              for state in build_nodes(StateObject, build)])
+    return cls(states_collection)
+
+  def save_data(self, backend:Backend):
+    def save_states(batch:List[BasicDefinition]):
+      backend.save_nodes([state_def.node for state_def in batch])
+
+    backend.write_batches('states', self.__states.values(), save_states)
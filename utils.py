@@ -1,11 +1,14 @@
 from enum import EnumMeta
-import yaml
 import json
 import glob
 # MODIFGEN from .exceptions import BaseException, BaseExceptionType
 from exceptions import BaseException, BaseExceptionType
-from typing import Dict
-from neomodel.core import StructuredNode
+from typing import Dict, TYPE_CHECKING
+
+# utils is imported by the mars and model modules used at runtime
+# yaml and neomodel are only imported by the build functions using them
+if TYPE_CHECKING:
+  from neomodel.core import StructuredNode
 
 # define metaclass for enumeration access
 class GetAttrEnum(EnumMeta):
@@ -63,6 +66,7 @@ def get_validation_schemas(schemas_dir:str)->Dict[str, Dict]:
 
 
 def get_config_from_file(yaml_file:str)-> Dict:
+    import yaml
     try:
       with open(yaml_file, 'r') as f:
           content = f.read()
@@ -79,8 +83,22 @@ def get_config_from_file(yaml_file:str)-> Dict:
                           f"the configuration file {yaml_file} not conform : yaml format not respected")
 
 
+def node_to_record(node:'StructuredNode') -> Dict:
+  """function to get the properties of a node under a plain dict format
+    (no neomodel object) to store it outside the graph
+
+  Args:
+      node (StructuredNode): the node
+
+  Returns:
+      Dict: the properties values by property name
+  """
+  properties = node.__class__.defined_properties(aliases=False, rels=False)
+  return dict([(name, getattr(node, name)) for name in properties])
+
+
 class BasicDefinition(object):
-  def __init__(self, node:StructuredNode):
+  def __init__(self, node:'StructuredNode'):
     object.__init__(self)
     self.__node = node
   
@@ -90,8 +108,8 @@ class BasicDefinition(object):
 
 class InstanceDefinition(BasicDefinition):
   def __init__(self,
-               node:StructuredNode,
-               mother_node:StructuredNode):
+               node:'StructuredNode',
+               mother_node:'StructuredNode'):
     BasicDefinition.__init__(self, node)
     self.__mother_node = mother_node
 